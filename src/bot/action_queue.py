@@ -0,0 +1,145 @@
+import numpy as np
+
+from lux.unit import move_deltas
+
+MOVE, TRANSFER, PICKUP, DIG, SELF_DESTRUCT, RECHARGE = range(6)
+
+
+def predict_queue(queue, horizon):
+    """
+    Actions the unit executes on the next turns if none of them fails, the way the env runs the queue:
+    the first action is executed n times, then dropped or, if repeat > 0, moved to the back with n = repeat.
+
+    Args:
+        queue: action queue, rows are [type, direction, resource, amount, repeat, n]
+        horizon (int): number of turns to predict
+
+    Returns:
+        list: (type, direction, resource) of every turn, shorter than the horizon if the queue runs out
+    """
+    pending = [[int(x) for x in row] for row in queue]
+    executed = []
+    while pending and len(executed) < horizon:
+        action = pending.pop(0)
+        executed += [tuple(action[:3])] * min(max(action[5], 1), horizon - len(executed))
+        if action[4] > 0:
+            pending.append(action[:5] + [action[4]])
+    return executed
+
+
+def predict_route(queue, pos, horizon):
+    """
+    Cells the unit moves into on the next `horizon` turns of the queue, in order. Moves to the center are skipped.
+    """
+    x, y = pos
+    route = []
+    for action_type, direction, _ in predict_queue(queue, horizon):
+        if action_type == MOVE and direction:
+            dx, dy = move_deltas[direction]
+            x, y = x + int(dx), y + int(dy)
+            route.append((x, y))
+    return route
+
+
+def predict_outcome(queue, pos, horizon):
+    """
+    Where the unit gets after `horizon` turns of the queue, how many moves it makes on the way
+    and the other actions it executes. Moves to the center count as staying.
+
+    Returns:
+        tuple: position, number of moves, list of (type, direction, resource) of the other actions
+    """
+    route = predict_route(queue, pos, horizon)
+    actions = [action for action in predict_queue(queue, horizon) if action[0] != MOVE]
+    return (route[-1] if route else tuple(pos)), len(route), actions
+
+
+class ActionQueue:
+    """
+    Action queue of a unit written into one preallocated (size, 6) array, rows are [type, direction, resource, amount, repeat, n].
+    Created once per unit and cleared every turn. Consecutive moves in the same direction are merged into one action,
+    actions beyond the size are dropped, as the env would do.
+    """
+
+    def __init__(self, size=20):
+        self.buffer = np.zeros((size, 6), dtype=np.int64)
+        self.length = 0
+
+    def clear(self):
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __repr__(self):
+        return f"ActionQueue({self.tolist()})"
+
+    @property
+    def rows(self):
+        """
+        View of the filled rows, valid until the queue is changed
+        """
+        return self.buffer[: self.length]
+
+    def append(self, action_type, direction=0, resource=0, amount=0, repeat=0, n=1):
+        if self.length == len(self.buffer):
+            return
+        self.buffer[self.length] = action_type, direction, resource, amount, repeat, n
+        self.length += 1
+
+    def move(self, direction, repeat=0, n=1):
+        if self.length and not repeat:
+            last = self.buffer[self.length - 1]
+            if last[0] == MOVE and last[1] == direction and not last[4]:
+                last[5] += n
+                return
+        self.append(MOVE, direction, repeat=repeat, n=n)
+
+    def moves(self, directions):
+        for direction in directions:
+            self.move(direction)
+
+    def transfer(self, transfer_direction, transfer_resource, transfer_amount, repeat=0, n=1):
+        assert 0 <= transfer_resource < 5
+        assert 0 <= transfer_direction < 5
+        self.append(TRANSFER, transfer_direction, transfer_resource, transfer_amount, repeat, n)
+
+    def pickup(self, pickup_resource, pickup_amount, repeat=0, n=1):
+        assert 0 <= pickup_resource < 5
+        self.append(PICKUP, 0, pickup_resource, pickup_amount, repeat, n)
+
+    def dig(self, repeat=0, n=1):
+        self.append(DIG, repeat=repeat, n=n)
+
+    def self_destruct(self, repeat=0, n=1):
+        self.append(SELF_DESTRUCT, repeat=repeat, n=n)
+
+    def recharge(self, x, repeat=0, n=1):
+        self.append(RECHARGE, amount=x, repeat=repeat, n=n)
+
+    def same_next_action(self, action_queue):
+        """
+        Whether the next action of the current queue of the unit is the first one of this queue, amounts are not compared
+        """
+        if not self.length or not len(action_queue):
+            return False
+        return predict_queue(self.rows, 1) == predict_queue(action_queue, 1)
+
+    def same_outcome(self, action_queue, pos, horizon):
+        """
+        Whether the current queue of the unit gets to the same position in `horizon` turns with as many moves
+        and executes the same other actions on the way, see predict_outcome()
+        """
+        return predict_outcome(self.rows, pos, horizon) == predict_outcome(action_queue, pos, horizon)
+
+    def tolist(self):
+        """
+        Output ready actions
+        """
+        return self.buffer[: self.length].tolist()
@@ -1,60 +1,146 @@
 import logging
 import os
 from bot.factory_behaviour import FactoryBehaviour
+from bot.logging import BehaviourFormatter, TurnTraceHandler
 from bot.placement_behaviour import PlacementBehaviour
+from bot.profiling import HotPathProfiler
+from bot.time_budget import TurnBudget
 from bot.unit_behaviour import UnitBehaviour
 
-from lux.kit import obs_to_game_state, EnvConfig
+from lux.kit import ObservationDecoder, EnvConfig
 import numpy as np
 
 
 from .task_manager import TaskManager
 from .map_manager import MapManager
+from .static_features import StaticFeatures
 
 
 logger = logging.getLogger()
 logger.setLevel(os.environ.get("LOGLEVEL", "CRITICAL"))  # to disable logging on leaderboard
 
-formatter = logging.Formatter("%(levelname)s - %(message)s")
+formatter = BehaviourFormatter("%(levelname)s - %(message)s")
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(formatter)
+console_handler.setLevel(logger.level)
 logger.addHandler(console_handler)
 
+# directory to write per turn JSONL traces with all the messages into, the console keeps LOGLEVEL
+trace_dir = os.environ.get("LOG_TRACE")
+if trace_dir:
+    logger.setLevel(logging.DEBUG)
+
+# directory to write call counts and time of the hot paths into, per turn and per match
+profile_dir = os.environ.get("PROFILE_HOTPATHS")
+
 
 class Agent:
+    # seconds left to the turn deadline when factories stop assigning tasks and building robots, only watering is decided
+    factory_reserve = 0.5
+    # seconds left to the turn deadline when robots with an action queue stop planning and keep following it
+    queue_only_reserve = 0.25
+
     def __init__(self, player: str, env_cfg: EnvConfig) -> None:
         self.player = player
         self.opp_player = "player_1" if self.player == "player_0" else "player_0"
         np.random.seed(0)
         self.env_cfg: EnvConfig = env_cfg
+        self.decoder = ObservationDecoder(env_cfg)
 
         self.manager = TaskManager(self.player)
+        self.budget = TurnBudget(max_steps=env_cfg.max_episode_length)
+        # persist across turns to reuse the movement graph and the static board features
+        self.static_features = StaticFeatures(self.player)
+        self.map_state = MapManager(
+            self.player,
+            self.static_features,
+            os.environ.get("PATH_BACKEND", "grid"),
+            cooperative=os.environ.get("PATH_PLANNER") == "cooperative",
+            budget=self.budget,
+        )
+
+        # behaviour objects by unit id, created once and disposed when the unit is destroyed
+        self.factory_behaviours = {}
+        self.unit_behaviours = {}
+
+        self.trace = None
+        if trace_dir:
+            self.trace = TurnTraceHandler(os.path.join(trace_dir, f"{player}.jsonl"))
+            logger.addHandler(self.trace)
+
+        self.profiler = None
+        if profile_dir:
+            self.profiler = HotPathProfiler(os.path.join(profile_dir, f"{player}.jsonl"), os.path.join(profile_dir, f"{player}_match.json"))
+            self.map_state.enable_profiling(self.profiler)
 
     def early_setup(self, step: int, obs, remainingOverageTime: int = 60):
         """
         Early Phase
         place bid, then place factories
         """
-        game_state = obs_to_game_state(step, self.env_cfg, obs)
-        return PlacementBehaviour(game_state, self.manager).act(step)
+        self.budget.start_turn(remainingOverageTime, obs["real_env_steps"])
+        game_state = self.decoder.decode(step, obs)
+        return PlacementBehaviour(game_state, self.manager, self.budget).act(step)
+
+    def _profiled(self, behaviour, names, prefix):
+        if self.profiler:
+            self.profiler.instrument(behaviour, names, prefix)
+        return behaviour
+
+    @staticmethod
+    def _sync_behaviours(behaviours, units, create):
+        for unit_id in behaviours.keys() - units.keys():
+            del behaviours[unit_id]
+        for unit_id, unit in units.items():
+            if unit_id not in behaviours:
+                behaviours[unit_id] = create(unit)
 
     def _act_factories(self, game_state, map_state):
         actions = {}
         factories = game_state.factories[self.player]
+        self._sync_behaviours(
+            self.factory_behaviours, factories, lambda factory: self._profiled(FactoryBehaviour(factory, self.manager), ["act"], "factory.")
+        )
 
         for unit_id, factory in factories.items():
-            logger.info(f"{game_state.real_env_steps}, {unit_id}")
-            actions.update(FactoryBehaviour(factory, game_state, self.manager, map_state).act())
+            logger.info("%s, %s", game_state.real_env_steps, unit_id)
+            behaviour = self.factory_behaviours[unit_id]
+            behaviour.refresh(factory, game_state, map_state)
+            if self.budget.expired(self.factory_reserve):
+                actions.update(behaviour.water())
+            else:
+                actions.update(behaviour.act())
 
         return actions
 
     def _act_robots(self, game_state, map_state):
         actions = {}
         units = game_state.units[self.player]
+        self._sync_behaviours(
+            self.unit_behaviours,
+            units,
+            lambda unit: self._profiled(UnitBehaviour(unit, self.env_cfg, self.manager), ["act", "get_direction"], "unit."),
+        )
 
-        for unit_id, unit in sorted(units.items()):
-            actions.update(UnitBehaviour(unit, game_state, self.manager, map_state).act())
+        if map_state.planner is not None and not self.budget.expired(map_state.planning_reserve):
+            # robots keep their targets from the previous turn, plan all of them at once
+            map_state.plan_moves([(unit_id, target) for unit_id, target in self.manager.bot_targets.items() if unit_id in units])
 
+        skipped = 0
+        for unit_id, unit in sorted(units.items()):
+            behaviour = self.unit_behaviours[unit_id]
+            behaviour.refresh(unit, game_state, map_state)
+            if len(unit.action_queue) and self.budget.expired(self.queue_only_reserve):
+                # out of time, robots which have something to do keep doing it
+                behaviour.keep_queue()
+                skipped += 1
+            else:
+                actions.update(behaviour.act())
+            if map_state.planner is not None:
+                map_state.drop_plan(unit_id)
+
+        if skipped:
+            logger.warning("%s, turn time is running out, %s robots kept their queues", game_state.real_env_steps, skipped)
         return actions
 
     def act(self, step: int, obs, remainingOverageTime: int = 60):
@@ -63,10 +149,15 @@ class Agent:
         2. Building Robots
         """
 
+        self.budget.start_turn(remainingOverageTime, obs["real_env_steps"])
         actions = dict()
-        game_state = obs_to_game_state(step, self.env_cfg, obs)
+        game_state = self.decoder.decode(step, obs)
+        if self.trace:
+            self.trace.start_turn()
 
-        map_state = MapManager(self.player, game_state)
+        self.static_features.refresh(game_state)
+        map_state = self.map_state
+        map_state.refresh(game_state)
         # self.manager.map_state = map_state
         self.manager.refresh(map_state)
 
@@ -76,5 +167,29 @@ class Agent:
         # move robots
         actions.update(self._act_robots(game_state, map_state))
 
-        logger.info(f"{game_state.real_env_steps}, {actions}")
+        logger.info("%s, %s", game_state.real_env_steps, actions)
+        last_turn = game_state.real_env_steps >= self.env_cfg.max_episode_length - 1
+        if last_turn:
+            logger.warning("%s, power saved by keeping action queues: %s", self.player, self.manager.queue_power_saved)
+        if self.trace:
+            self.trace.end_turn(
+                step=game_state.real_env_steps, player=self.player, actions=actions, queue_power_saved=self.manager.queue_power_saved
+            )
+        if self.profiler:
+            self.profiler.end_turn(game_state.real_env_steps, last=last_turn)
+        if last_turn:
+            self.close()
         return actions
+
+    def close(self):
+        """
+        Detaches the trace handler from the module logger and writes the profile of the match.
+        The process may go on with other matches (kaggle keeps the module, so does the in-process A/B engine),
+        so it is called after the last turn and when the agent of the player is replaced.
+        """
+        if self.trace:
+            logger.removeHandler(self.trace)
+            self.trace.close()
+            self.trace = None
+        if self.profiler:
+            self.profiler.dump_match()
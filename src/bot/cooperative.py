@@ -0,0 +1,100 @@
+import heapq
+import itertools
+
+import numpy as np
+
+from lux.unit import move_deltas
+
+# plain ints, numpy scalars are slow in the search loop
+DELTAS = [tuple(delta) for delta in move_deltas.tolist()]
+
+
+class CooperativePlanner:
+    """
+    Windowed cooperative A*: robots are planned one by one, every path is searched in space-time
+    for the first `window` turns avoiding the cells reserved by the robots planned before,
+    and follows the static shortest path to the target after that.
+    """
+
+    def __init__(self, window, wait_cost=20):
+        self.window = window
+        # staying in place is priced as a plain move, so short waits are preferred over long detours
+        self.wait_cost = wait_cost
+
+    def plan(self, reservations, unit_id, pos, target, costs, to_target, blocked=None):
+        """
+        Args:
+            reservations: ReservationTable with the moves of the robots planned before
+            costs (np.ndarray): (W, H) cost of moving into every cell, see pathfinding.move_costs:
+                opponent factory tiles are not excluded, they cost so much that any way around them is cheaper
+            to_target (np.ndarray): (W, H) movement cost from every cell to the target, the search heuristic
+            blocked (np.ndarray): (W, H) cells to avoid on the next turn in addition to the reservations
+
+        Returns:
+            list: directions to follow, [0] if there is no way better than staying
+        """
+        width, height = costs.shape
+        window = min(self.window, reservations.horizon)
+        start = (0, *map(int, pos))
+        target = tuple(map(int, target))
+
+        counter = itertools.count()
+        heap = [(to_target[start[1:]], next(counter), 0.0, start)]
+        came_from = {start: None}
+        best = {start: 0.0}
+        while heap:
+            _, _, g, node = heapq.heappop(heap)
+            if g > best[node]:
+                continue
+            t, x, y = node
+            if t == window or ((x, y) == target and self._can_stay(reservations, unit_id, target, t, window)):
+                return self._directions(came_from, node) + self._descend((x, y), target, costs, to_target)
+
+            for direction, (dx, dy) in enumerate(DELTAS):
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                step_cost = self.wait_cost if direction == 0 else costs[nx, ny]
+                if not reservations.is_free(t + 1, (nx, ny), unit_id):
+                    continue
+                if t == 0 and blocked is not None and blocked[nx, ny]:
+                    continue
+
+                child = (t + 1, nx, ny)
+                child_g = g + step_cost
+                if child_g < best.get(child, np.inf):
+                    best[child] = child_g
+                    came_from[child] = (node, direction)
+                    heapq.heappush(heap, (child_g + to_target[nx, ny], next(counter), child_g, child))
+        return [0]
+
+    @staticmethod
+    def _can_stay(reservations, unit_id, cell, t, window):
+        return all(reservations.is_free(k, cell, unit_id) for k in range(t + 1, window + 1))
+
+    @staticmethod
+    def _directions(came_from, node):
+        directions = []
+        while came_from[node] is not None:
+            node, direction = came_from[node]
+            directions.append(direction)
+        return directions[::-1] or [0]
+
+    @staticmethod
+    def _descend(cell, target, costs, to_target, limit=20):
+        """
+        Static shortest path from the cell to the target, walking down the cost field
+        """
+        width, height = costs.shape
+        directions = []
+        x, y = cell
+        while (x, y) != target and len(directions) < limit:
+            options = [
+                (costs[x + dx, y + dy] + to_target[x + dx, y + dy], direction)
+                for direction, (dx, dy) in enumerate(DELTAS[1:], start=1)
+                if 0 <= x + dx < width and 0 <= y + dy < height
+            ]
+            _, direction = min(options)
+            directions.append(direction)
+            x, y = x + DELTAS[direction][0], y + DELTAS[direction][1]
+        return directions
@@ -10,17 +10,23 @@ from lux.kit import GameState
 
 
 class FactoryBehaviour:
-    def __init__(self, factory: Factory, game_state: GameState, manager: TaskManager, map_state: MapManager):
-        self.factory = factory
-        self.unit_id = self.factory.unit_id
-        self.game_state = game_state
+    """
+    Created once per factory and kept while the factory is alive, refresh() has to be called every turn before act()
+    """
+
+    def __init__(self, factory: Factory, manager: TaskManager):
+        self.unit_id = factory.unit_id
         self.manager = manager
-        self.map_state = map_state
-        self.robots = self.manager.get_factory_bots(self.factory.unit_id)
 
         logger = logging.getLogger(__class__.__name__)
         self.logger = BehaviourLoggingAdapter(logger, {"behaviour": self})
 
+    def refresh(self, factory: Factory, game_state: GameState, map_state: MapManager):
+        self.factory = factory
+        self.game_state = game_state
+        self.map_state = map_state
+        self.robots = self.manager.get_factory_bots(self.factory.unit_id)
+
     def _under_attack(self):
         opp_botpos, opponent_unit_distances = self.map_state.get_tiles_distances(self.factory.pos, "enemy", "l2")
         if not len(opp_botpos):
@@ -134,7 +140,7 @@ class FactoryBehaviour:
                 self.manager.bots[x] = RobotTask("rubble")
 
     def _lichen_tiles_count(self):
-        return np.sum(self.game_state.board.lichen_strains == self.factory.strain_id)
+        return self.game_state.get_lichen_index().tiles_count(self.factory.strain_id)
 
     def act(self):
         actions = {}
@@ -182,8 +188,14 @@ class FactoryBehaviour:
         # if not actions and factory.cargo.water > 100 and factory.power < 1000 and self._lichen_tiles_count() < 20:
         #     actions = {unit_id: factory.water()}
 
-        step = game_state.real_env_steps
-        if factory.can_water(game_state) and step > 800 and factory.cargo.water > (1000 - step) + 100:
-            actions = {unit_id: factory.water()}
+        return self.water() or actions
 
-        return actions
+    def water(self):
+        """
+        Watering decision only, what is left of the factory turn when the turn time is running out
+        """
+        factory = self.factory
+        step = self.game_state.real_env_steps
+        if factory.can_water(self.game_state) and step > 800 and factory.cargo.water > (1000 - step) + 100:
+            return {factory.unit_id: factory.water()}
+        return {}
@@ -1,7 +1,82 @@
+import json
 import logging
 
+import numpy as np
+
 
 class BehaviourLoggingAdapter(logging.LoggerAdapter):
+    """
+    Attaches the turn and the unit id to the records, messages are formatted only if the level is enabled
+    """
+
     def process(self, msg, kwargs):
-        prefix = '{0.game_state.real_env_steps} - {0.unit_id} - '.format(self.extra["behaviour"])
-        return '{0}{1}'.format(prefix, msg), kwargs
+        behaviour = self.extra["behaviour"]
+        kwargs["extra"] = {"step": behaviour.game_state.real_env_steps, "unit_id": behaviour.unit_id}
+        return msg, kwargs
+
+
+class BehaviourFormatter(logging.Formatter):
+    """
+    Prefixes the messages of the behaviours with the turn and the unit id
+    """
+
+    def formatMessage(self, record):
+        if hasattr(record, "unit_id"):
+            record.message = f"{record.step} - {record.unit_id} - {record.message}"
+        return super().formatMessage(record)
+
+
+def to_jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(x) for x in value]
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+class TurnTraceHandler(logging.Handler):
+    """
+    Collects the records of the agent turn and writes them as a single JSONL line at the end of the turn.
+    Messages are never formatted, the template and the arguments are kept as they are.
+
+    Several agents may run in one process, the handler only records between start_turn() and end_turn() of its agent.
+    """
+
+    def __init__(self, path, level=logging.DEBUG):
+        super().__init__(level)
+        self.path = path
+        self._records = None
+        # the file is truncated when the agent is created
+        open(path, "w").close()
+
+    def start_turn(self):
+        self._records = []
+
+    def emit(self, record):
+        if self._records is None:
+            return
+        self._records.append(
+            {
+                "level": record.levelname,
+                "logger": record.name,
+                "unit_id": getattr(record, "unit_id", None),
+                "msg": record.msg,
+                "args": to_jsonable(record.args),
+            }
+        )
+
+    def end_turn(self, **fields):
+        """
+        Args:
+            fields: turn level data written along with the records, e.g. step and actions
+        """
+        line = json.dumps({**to_jsonable(fields), "records": self._records})
+        self._records = None
+        with open(self.path, "a") as f:
+            f.write(line + "\n")
@@ -1,64 +1,76 @@
-import logging
-import networkx as nx
+from collections import OrderedDict
+
 import numpy as np
 
 from scipy.ndimage import binary_dilation
-from scipy.spatial.distance import cdist
 
+from bot.cooperative import CooperativePlanner
+from bot.pathfinding import PATH_BACKENDS, move_costs
+from bot.reservations import ReservationTable
+from bot.time_budget import TurnBudget
+from bot.unit_index import UnitIndex
 from lux.kit import GameState
 from lux.unit import move_deltas
-from lux.utils import direction_to
-
-
-def get_3x3_indices(pos):
-    indices = np.indices((3, 3)) - 1  # create array of indices with center at (1,1)
-    shift = pos.reshape(-1, 1, 1)  # reshape shift array for broadcasting
-    indices = indices + shift  # shift indices to center at (x,y)
-    indices = indices.reshape(2, -1).T  # flatten indices and return as Nx2 array
-    return indices
 
 
 class MapManager:
-    def __init__(self, player, game_state) -> None:
+    distance_fields_cache_size = 128
+    # seconds left to the turn deadline when the cooperative planner gives way to the per-robot search
+    planning_reserve = 1.0
+
+    def __init__(self, player, static_features, path_backend="grid", cooperative=False, budget=None) -> None:
         self.player = player
+        self.static_features = static_features
         self.opp_player = "player_1" if self.player == "player_0" else "player_0"
-        self.refresh(game_state=game_state)
-
-    def _build_graph(self, game_state):
-        G = nx.DiGraph()
-
-        def add_delta(a):
-            return tuple(np.array(a[0]) + np.array(a[1]))
-
-        logging.info("%s", game_state.factories[self.opp_player])
-
-        rubbles = game_state.board.rubble
-        for x in range(rubbles.shape[0]):
-            for y in range(rubbles.shape[1]):
-                cost = rubbles[x, y]
-                if (x, y) in self.enemy_factory_tiles:
-                    cost = 10_000
-
-                G.add_node((x, y), rubble=cost)
-
-        deltas = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-        for g1 in G.nodes:
-            x1, y1 = g1
-            for delta in deltas:
-                g2 = add_delta((g1, delta))
-                if G.has_node(g2):
-                    G.add_edge(g1, g2, cost=20 + rubbles[g2])
-        return G
+        self._pathfinder = PATH_BACKENDS[path_backend]()
+        self._distance_fields = OrderedDict()
+        self._targets_fields = {}
+        self.reservations = None
+        self.units_index = None
+        # joint planning of the own robots moves, otherwise every robot searches its path on its own
+        self.planner = CooperativePlanner(window=5) if cooperative else None
+        self.plans = {}
+        self._to_target_fields = {}
+        self.budget = budget or TurnBudget()
+        self.profiler = None
+
+    def enable_profiling(self, profiler):
+        """
+        Counts calls and time of the queries and of the graph builds and searches of the pathfinder
+        """
+        self.profiler = profiler
+        profiler.instrument(
+            self,
+            ["shortest_path_with_cost", "distance_field", "get_tiles_distances", "targets_field", "check_collision", "plan_path"],
+        )
+        profiler.instrument(self._pathfinder, ["_build", "update", "distance_field", "targets_field"], prefix="graph.")
 
     def shortest_path(self, pos_from, pos_to):
-        if np.all(pos_from == pos_to):
-            return [0]
-        path = np.array(nx.shortest_path(self._graph, source=tuple(pos_from), target=tuple(pos_to), weight="cost"))
-        return [direction_to(a, b) for a, b in zip(path[:-1], path[1:])]
+        return self.shortest_path_with_cost(pos_from, pos_to)[0]
 
     def shortest_path_cost(self, pos_from, pos_to):
-        path = nx.shortest_path(self._graph, source=tuple(pos_from), target=tuple(pos_to), weight="cost")
-        return nx.path_weight(self._graph, path, "cost")
+        return self.shortest_path_with_cost(pos_from, pos_to)[1]
+
+    def shortest_path_with_cost(self, pos_from, pos_to):
+        if not self._pathfinder.paths_from_fields:
+            return self._pathfinder.shortest_path(pos_from, pos_to)
+        return self._pathfinder.path(self.distance_field(pos_from), pos_to)
+
+    def distance_field(self, pos_from):
+        """
+        Single source shortest paths from the position, cached for the current turn.
+        All the queries from the same origin (e.g. fallback tiles in get_direction) walk the same field.
+        """
+        key = tuple(pos_from)
+        if key in self._distance_fields:
+            self._distance_fields.move_to_end(key)
+            return self._distance_fields[key]
+
+        field = self._pathfinder.distance_field(pos_from)
+        self._distance_fields[key] = field
+        if len(self._distance_fields) > self.distance_fields_cache_size:
+            self._distance_fields.popitem(last=False)
+        return field
 
     def get_closest_factory(self, pos):
         factory_distances = np.mean((self.factory_tiles - pos) ** 2, 1)
@@ -68,53 +80,46 @@ class MapManager:
         return closest_factory_id, closest_factory_tile
 
     def get_vulnerable_enemies(self):
-        opp_botpos = np.array([xy for xy in self.opp_botpos.values() if tuple(xy) not in self.enemy_factory_tiles])
-        return opp_botpos
+        return self.units_index.locations(self.opp_player, ~self.static_features.enemy_factory_mask)
 
-    def get_robot_by_pos(self, pos):
-        for unit in self.game_state.units[self.opp_player].values():
-            if np.all(np.equal(pos, unit.pos)):
-                return unit
+    def get_enemies_within(self, pos, radius):
+        """
+        Returns:
+            tuple[np.ndarray, np.ndarray]: vulnerable enemies within the manhattan radius sorted by the distance, and the distances
+        """
+        return self.units_index.within(self.opp_player, pos, radius, ~self.static_features.enemy_factory_mask)
 
-    def get_lichen_borders(self, player):
-        opponent_strains = [x.strain_id for x in self.game_state.factories[player].values()]
-        opponent_lichen = np.isin(self.game_state.board.lichen_strains, opponent_strains)
+    def get_robot_by_pos(self, pos):
+        unit_id = self.units_index.unit_at(self.opp_player, pos)
+        if unit_id is not None:
+            return self.game_state.units[self.opp_player][unit_id]
+
+    def move_bot(self, unit_id, pos):
+        """
+        Own robot is going to be on the position on the next turn
+        """
+        self.botpos[unit_id] = tuple(pos)
+        self.units_index.move(unit_id, pos)
+
+    def get_lichen_borders_mask(self, player):
+        strains = [x.strain_id for x in self.game_state.factories[player].values()]
+        lichen = np.isin(self.game_state.board.lichen_strains, strains)
         struct = np.array([[0, 1, 0], [1, 1, 1], [0, 1, 0]])
-        # Dilate the nonzero elements
-        dilated = binary_dilation(opponent_lichen, structure=struct).astype(int)
+        # Dilate the nonzero elements, then subtract the original ones
+        return binary_dilation(lichen, structure=struct) & ~lichen
 
-        # Subtract the original nonzero elements from the dilated elements
-        border = dilated - opponent_lichen
-        return np.argwhere(border)
+    def get_lichen_borders(self, player):
+        return np.argwhere(self.get_lichen_borders_mask(player))
 
     def get_tiles_to_clean(self):
-        lichen_borders = self.get_lichen_borders(self.player)
-
-        rubble_locations = self.rubble_locations.reshape(-1, 2)
-        mask = cdist(self.factory_tiles, rubble_locations, "cityblock").min(axis=0) < 9
-        mask_border = (rubble_locations[:, None] == lichen_borders).all(axis=2).any(axis=1)
+        near_factory = self.static_features.factories_distance_map < 9
+        rubble = (self.rubble_map >= 1) & (near_factory | self.get_lichen_borders_mask(self.player))
 
-        rubble_locations = self.rubble_locations.reshape(-1, 2)[mask | mask_border]
+        # ignore resources and tiles that prevent enemy lichen from spreading
+        excluded = self.ice_mask | self.ore_mask | self.get_lichen_borders_mask(self.opp_player)
+        return np.vstack([np.argwhere(rubble & ~excluded), np.argwhere(self.opponent_lichen_mask & ~excluded)])
 
-        rubble = np.vstack([rubble_locations, self.opponent_lichen_locations.reshape(-1, 2)])
-
-        enemy_borders = self.get_lichen_borders(self.opp_player)
-
-        resources = np.vstack([self.ice_locations, self.ore_locations, enemy_borders])
-        mask = ~(rubble[:, None] == resources).all(axis=2).any(axis=1)
-        return rubble[mask]
-
-    def get_factories_neigborhood(self, dist):
-        map_size = self.game_state.env_cfg.map_size
-        x, y = np.meshgrid(np.arange(map_size), np.arange(map_size))
-        points = np.column_stack((x.ravel(), y.ravel()))
-
-        factory_array = np.array(self.factory_tiles)
-        distances = cdist(points, factory_array, 'cityblock')
-        is_near_factory = np.any(distances == dist, axis=1)
-        return points[is_near_factory]
-
-    def get_tiles_distances(self, pos, kind, distance="l1"):
+    def _get_locations(self, kind):
         mapping = {
             "ice": self.ice_locations,
             "ore": self.ore_locations,
@@ -123,7 +128,10 @@ class MapManager:
             "opponent_lichen": self.opponent_lichen_locations,
             "factory_border": self.factories_neigborhood
         }
-        locations = mapping[kind]
+        return mapping[kind]
+
+    def get_tiles_distances(self, pos, kind, distance="l1"):
+        locations = self._get_locations(kind)
         if not len(locations):
             return [], []
 
@@ -131,75 +139,147 @@ class MapManager:
             distances = np.sum(np.abs(locations - pos), 1)
         elif distance == "l2":
             distances = np.mean((locations - pos) ** 2, 1)
-        elif distance == "cost":  # too expensive to compute
-            distances = np.array([self.shortest_path_cost(pos, loc) for loc in locations])
+        elif distance == "cost":
+            distances = self._pathfinder.costs(self.distance_field(pos), locations)
         idx = np.argsort(distances)
         return locations[idx], distances[idx]
 
-    def check_collision(self, pos, direction, unit_type="LIGHT"):
-        unitpos = set(self.botpos.values())
-
+    def targets_field(self, kind):
+        """
+        Rubble-weighted distance to the closest tile of the kind for every cell of the map.
+        Computed lazily, at most once per turn: the tiles of ice and ore never change,
+        but rubble, and so the costs, changes almost every turn.
+        """
+        if kind not in self._targets_fields:
+            self._targets_fields[kind] = self._pathfinder.targets_field(self._get_locations(kind))
+        return self._targets_fields[kind]
+
+    def get_closest_target(self, pos, kind):
+        """
+        Returns:
+            tuple[np.ndarray, float]: closest tile of the kind by movement cost and the cost to get there,
+            (None, inf) if there are no such tiles
+        """
+        field = self.targets_field(kind)
+        x, y = pos
+        if field.nearest[x, y, 0] < 0:
+            return None, np.inf
+        return field.nearest[x, y], field.distances[x, y]
+
+    def check_collision(self, pos, direction, unit_type="LIGHT", unit_id=None):
+        """
+        Whether moving in the direction on the next turn would hit another own robot, lights also avoid current heavies' tiles
+        """
         new_pos = pos + move_deltas[direction]
-
-        if unit_type == "LIGHT":
-            return tuple(new_pos) in unitpos or tuple(new_pos) in self.botposheavy.values()
-        else:
-            return tuple(new_pos) in unitpos
+        if not self.reservations.is_free(1, new_pos, unit_id):
+            return True
+        if unit_type != "LIGHT" or np.any(new_pos < 0) or np.any(new_pos >= self.heavy_mask.shape):
+            return False
+        return bool(self.heavy_mask[new_pos[0], new_pos[1]])
+
+    def to_target_field(self, target):
+        """
+        Movement cost from every cell to the target, cached for the current turn
+        """
+        key = tuple(target)
+        if key not in self._to_target_fields:
+            self._to_target_fields[key] = self._pathfinder.targets_field(np.array([key])).distances
+        return self._to_target_fields[key]
+
+    def plan_path(self, unit_id, pos, target, unit_type="LIGHT"):
+        """
+        Windowed cooperative A* path avoiding the moves of the robots planned before.
+        The path is reserved until the unit commits to its moves with reserve_path() or the plan is dropped.
+
+        Returns:
+            list: directions to follow
+        """
+        blocked = self.heavy_mask if unit_type == "LIGHT" else None
+        directions = self.planner.plan(self.reservations, unit_id, pos, target, self.move_costs, self.to_target_field(target), blocked)
+        self.reservations.reserve_path(unit_id, pos, directions)
+        self.plans[unit_id] = (tuple(target), directions)
+        return directions
+
+    def plan_moves(self, requests):
+        """
+        Prioritized planning of all the robots moving to known targets, heavies first.
+        Robots take their plan with get_plan(), the ones changing the target plan again on their own.
+
+        Args:
+            requests: list of (unit_id, target) pairs
+        """
+        units = self.game_state.units[self.player]
+        requests = sorted(requests, key=lambda request: (units[request[0]].unit_type != "HEAVY", request[0]))
+        self.plans = {}
+        for unit_id, target in requests:
+            unit = units[unit_id]
+            self.plan_path(unit_id, unit.pos, target, unit.unit_type)
+
+    def get_plan(self, unit_id, target):
+        """
+        Returns:
+            list: planned directions to the target, None if the unit has no plan to this target
+        """
+        planned_target, directions = self.plans.get(unit_id, (None, None))
+        if planned_target != tuple(target):
+            return None
+        return directions
+
+    def reserve_path(self, unit_id, pos, directions):
+        """
+        Reserves the moves the unit has committed to, its unused plan is dropped
+        """
+        self.plans.pop(unit_id, None)
+        self.reservations.reserve_path(unit_id, pos, directions)
+
+    def drop_plan(self, unit_id):
+        """
+        The unit has not committed to any moves, it is expected to stay
+        """
+        if self.plans.pop(unit_id, None) is not None:
+            self.reservations.reserve_path(unit_id, self.botpos[unit_id], [0])
 
     def refresh(self, game_state: GameState):
         self.game_state = game_state
-        self.enemy_factory_tiles = {
-            tuple(xy) for factory in game_state.factories[self.opp_player].values() for xy in get_3x3_indices(factory.pos).tolist()
-        }
-        self._graph = self._build_graph(game_state)
+        static = self.static_features
+        self.enemy_factory_tiles = static.enemy_factory_tiles
+        self._pathfinder.update(game_state.board.rubble, static.enemy_factory_mask)
+        self._targets_fields = {}
 
         # Unit locations
-        self.botpos = {}
-        self.botposheavy = {}
-        self.opp_botpos = {}
-        for player in [self.player, self.opp_player]:
-            for unit_id, unit in game_state.units[player].items():
-                if player == self.player:
-                    self.botpos[unit_id] = tuple(unit.pos)
-                else:
-                    self.opp_botpos[unit_id] = tuple(unit.pos)
-
-                if unit.unit_type == "HEAVY":
-                    self.botposheavy[unit_id] = tuple(unit.pos)
-
-        factory_tiles = []
-        # factory_units = []
-        factory_ids = []
-        factories = game_state.factories[self.player]
-
-        for unit_id, factory in factories.items():
-            factory_tiles += [factory.pos]
-            # factory_units += [factory]
-            factory_ids += [unit_id]
-
-        factory_tiles = np.array(factory_tiles)  # Factory locations (to go back to)
-        self.factory_tiles = factory_tiles
-        # self.factory_units = factory_units
-        self.factory_ids = factory_ids
+        if self.units_index is None:
+            self.units_index = UnitIndex(game_state.board.rubble.shape)
+            self.reservations = ReservationTable(game_state.board.rubble.shape)
+        self.units_index.reset(game_state.units)
+        self.botpos = {unit_id: tuple(unit.pos) for unit_id, unit in game_state.units[self.player].items()}
+        self.botposheavy = {
+            unit_id: pos for unit_id, pos in self.botpos.items() if game_state.units[self.player][unit_id].unit_type == "HEAVY"
+        }
+        self.reservations.reset(self.botpos)
+        # lights avoid the tiles own and opponent heavies are on at the start of the turn
+        self.heavy_mask = self.units_index.occupied(self.player, "HEAVY") | self.units_index.occupied(self.opp_player, "HEAVY")
+        self.plans = {}
+        self._to_target_fields = {}
+        self._distance_fields.clear()
+        # same costs as in the pathfinders, so the to_target_field heuristic of the cooperative planner is exact
+        self.move_costs = move_costs(game_state.board.rubble, static.enemy_factory_mask)
+
+        self.factory_tiles = static.factory_tiles
+        self.factory_ids = static.factory_ids
         self.factories = game_state.factories[self.player]
 
         # Resource map and locations
-        ice_map = game_state.board.ice
-        ore_map = game_state.board.ore
-        rubble_map = game_state.board.rubble
-
-        ice_locations_all = np.argwhere(ice_map >= 1)  # numpy position of every ice tile
-        ore_locations_all = np.argwhere(ore_map >= 1)  # numpy position of every ore tile
-        rubble_locations_all = np.argwhere(rubble_map >= 1)  # numpy position of every rubble tile
-
-        self.ice_locations = ice_locations_all
-        self.ore_locations = ore_locations_all
-        self.rubble_locations = rubble_locations_all
-        self.rubble_map = rubble_map
+        self.ice_locations = static.ice_locations
+        self.ore_locations = static.ore_locations
+        self.ice_mask = static.ice_mask
+        self.ore_mask = static.ore_mask
+        self.rubble_map = game_state.board.rubble
+        self.rubble_locations = np.argwhere(self.rubble_map >= 1)  # numpy position of every rubble tile
 
         opponent_strains = [x.strain_id for x in game_state.factories[self.opp_player].values()]
-        self.opponent_lichen_locations = np.argwhere(np.isin(game_state.board.lichen_strains, opponent_strains))
+        self.opponent_lichen_mask = np.isin(game_state.board.lichen_strains, opponent_strains)
+        self.opponent_lichen_locations = np.argwhere(self.opponent_lichen_mask)
 
         self.tiles_to_clean = self.get_tiles_to_clean()
         self.vulnerable_enemies = self.get_vulnerable_enemies()
-        self.factories_neigborhood = self.get_factories_neigborhood(7)
+        self.factories_neigborhood = static.factories_neigborhood
@@ -0,0 +1,172 @@
+import heapq
+import itertools
+from typing import Any, NamedTuple
+
+import networkx as nx
+import numpy as np
+
+from lux.utils import direction_to
+
+
+class DistanceField(NamedTuple):
+    """
+    Result of a single source Dijkstra, any path starting at the source is obtained by walking the predecessors
+    """
+
+    source: Any
+    distances: Any
+    predecessors: Any
+
+
+class TargetsField(NamedTuple):
+    """
+    Result of a multi source Dijkstra over reversed edges: cost to reach the closest target from every cell
+    """
+
+    distances: np.ndarray  # (W, H) movement cost to the closest target, inf if there are no targets
+    nearest: np.ndarray  # (W, H, 2) position of the closest target, -1 if there are no targets
+
+
+class MovementGraph:
+    """
+    Movement graph which lives across turns.
+    It is built once, after that only the cells with changed rubble or factory occupancy are patched.
+    """
+
+    deltas = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    blocked_cost = 10_000
+    # paths come from the bidirectional search of nx.shortest_path, a distance field only serves the costs
+    paths_from_fields = False
+
+    def __init__(self):
+        self.graph = None
+        self._rubble = None
+        self._blocked = None
+
+    def _move_cost(self, rubble, blocked, x, y):
+        # moving into the cell costs 20 + its rubble, robots entering opponent factories are destroyed
+        return self.blocked_cost if blocked[x, y] else 20 + rubble[x, y]
+
+    def _build(self, rubble, blocked):
+        G = nx.DiGraph()
+        width, height = rubble.shape
+
+        for x in range(width):
+            for y in range(height):
+                G.add_node((x, y))
+
+        for x1, y1 in G.nodes:
+            for dx, dy in self.deltas:
+                x2, y2 = x1 + dx, y1 + dy
+                if 0 <= x2 < width and 0 <= y2 < height:
+                    G.add_edge((x1, y1), (x2, y2), cost=self._move_cost(rubble, blocked, x2, y2))
+        return G
+
+    def _patch(self, cells, rubble, blocked):
+        G = self.graph
+        for x, y in cells.tolist():
+            node = (x, y)
+            # edge cost depends on the cell we are moving into
+            cost = self._move_cost(rubble, blocked, x, y)
+            for pred in G.predecessors(node):
+                G[pred][node]["cost"] = cost
+
+    def update(self, rubble, blocked):
+        """
+        Sync the graph with the board
+
+        Args:
+            rubble (np.ndarray): rubble map
+            blocked (np.ndarray): boolean mask of the impassable (enemy factory) tiles
+
+        Returns:
+            bool: whether the graph has been changed
+        """
+        if self.graph is None or self._rubble.shape != rubble.shape:
+            self.graph = self._build(rubble, blocked)
+            changed = True
+        else:
+            changed_cells = np.argwhere((rubble != self._rubble) | (blocked != self._blocked))
+            if len(changed_cells):
+                self._patch(changed_cells, rubble, blocked)
+            changed = len(changed_cells) > 0
+
+        # board arrays are updated in place by process_obs, so keep own copies to diff against
+        self._rubble = rubble.copy()
+        self._blocked = blocked.copy()
+        return changed
+
+    def distance_field(self, pos_from):
+        source = tuple(pos_from)
+        predecessors, distances = nx.dijkstra_predecessor_and_distance(self.graph, source, weight="cost")
+        return DistanceField(source, distances, predecessors)
+
+    def targets_field(self, targets):
+        """
+        Multi source Dijkstra over the reversed edges, labelling every cell with its closest target instead of building paths.
+        Same search order as nx.multi_source_dijkstra, so equal cost ties go to the same targets.
+
+        Args:
+            targets (np.ndarray): Nx2 target positions
+        """
+        pred = self.graph.pred
+        # all the edges into a cell cost the same, plain lists are faster than the edge attributes
+        move_costs = np.where(self._blocked, self.blocked_cost, 20 + self._rubble).tolist()
+        counter = itertools.count()
+        dist = {}
+        seen = {}
+        sources = {}
+        heap = []
+        for target in set(map(tuple, targets.tolist())):
+            seen[target] = 0
+            sources[target] = target
+            heapq.heappush(heap, (0, next(counter), target))
+
+        while heap:
+            node_dist, _, node = heapq.heappop(heap)
+            if node in dist:
+                continue
+            dist[node] = node_dist
+            source = sources[node]
+            # reversed edges: from the cell we are moving into back to the cell we are moving from
+            prev_dist = node_dist + move_costs[node[0]][node[1]]
+            for prev in pred[node]:
+                if prev not in dist and (prev not in seen or prev_dist < seen[prev]):
+                    seen[prev] = prev_dist
+                    sources[prev] = source
+                    heapq.heappush(heap, (prev_dist, next(counter), prev))
+
+        distances = np.full(self._rubble.shape, np.inf)
+        nearest = np.full((*self._rubble.shape, 2), -1)
+        if dist:
+            cells = tuple(np.array(list(dist)).T)
+            distances[cells] = list(dist.values())
+            nearest[cells] = [sources[node] for node in dist]
+        return TargetsField(distances, nearest)
+
+    def costs(self, field, locations):
+        return np.array([field.distances[tuple(loc)] for loc in locations.tolist()])
+
+    def path(self, field, pos_to):
+        """
+        The path is searched with the bidirectional search of nx.shortest_path rather than walked over the field,
+        so equal cost paths are resolved as they always were on this backend
+
+        Returns:
+            tuple[list, float]: directions to follow from the field source and total cost of the path
+        """
+        target = tuple(pos_to)
+        if field.source == target:
+            return [0], 0
+        return self.shortest_path(field.source, target)
+
+    def shortest_path(self, pos_from, pos_to):
+        """
+        Returns:
+            tuple[list, float]: directions to follow and total cost of the path
+        """
+        if np.all(np.equal(pos_from, pos_to)):
+            return [0], 0
+        cost, path = nx.bidirectional_dijkstra(self.graph, tuple(pos_from), tuple(pos_to), weight="cost")
+        path = np.array(path)
+        return [direction_to(a, b) for a, b in zip(path[:-1], path[1:])], cost
@@ -0,0 +1,123 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from bot.movement_graph import DistanceField, MovementGraph, TargetsField
+
+
+def move_costs(rubble, blocked):
+    """
+    Cost of moving into every cell, the same as on the edges of MovementGraph:
+    20 + rubble, MovementGraph.blocked_cost for the blocked (opponent factory) cells
+    """
+    return np.where(blocked, float(MovementGraph.blocked_cost), 20.0 + rubble)
+
+
+class GridPathfinder:
+    """
+    Shortest paths over the dense board cost array.
+    Graph structure is a CSR matrix with 4-neighbours edges, built once, only edge weights are refreshed.
+    """
+
+    # every path query from the same origin walks the same cached distance field
+    paths_from_fields = True
+
+    def __init__(self):
+        self._matrix = None
+        self._reversed = None
+        self._shape = None
+        self._rubble = None
+        self._blocked = None
+
+    def _build(self, shape):
+        width, height = shape
+        cells = np.arange(width * height).reshape(shape)
+
+        sources, targets = [], []
+        for dx, dy in MovementGraph.deltas:
+            src = cells[max(-dx, 0) : width - max(dx, 0), max(-dy, 0) : height - max(dy, 0)]
+            dst = cells[max(dx, 0) : width + min(dx, 0), max(dy, 0) : height + min(dy, 0)]
+            sources.append(src.ravel())
+            targets.append(dst.ravel())
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+
+        self._matrix = csr_matrix((np.ones(len(sources)), (sources, targets)), shape=(width * height, width * height))
+        self._matrix.sort_indices()
+        self._reversed = self._matrix.transpose().tocsr()
+        self._reversed.sort_indices()
+        # in the reversed graph the edge goes out of the cell we are moving into
+        self._reversed_rows = np.repeat(np.arange(width * height), np.diff(self._reversed.indptr))
+        self._shape = shape
+
+    def update(self, rubble, blocked):
+        """
+        Returns:
+            bool: whether the edge costs have been changed
+        """
+        if self._matrix is None or self._shape != rubble.shape:
+            self._build(rubble.shape)
+        elif np.array_equal(rubble, self._rubble) and np.array_equal(blocked, self._blocked):
+            return False
+
+        costs = move_costs(rubble, blocked).ravel()
+        self._matrix.data = costs[self._matrix.indices]
+        self._reversed.data = costs[self._reversed_rows]
+        # board arrays are updated in place by process_obs, so keep own copies to diff against
+        self._rubble = rubble.copy()
+        self._blocked = blocked.copy()
+        return True
+
+    def _direction(self, a, b):
+        height = self._shape[1]
+        return {height: 2, -height: 4, 1: 3, -1: 1}[b - a]
+
+    def distance_field(self, pos_from):
+        source = np.ravel_multi_index(tuple(pos_from), self._shape)
+        distances, predecessors = dijkstra(self._matrix, indices=source, return_predecessors=True)
+        return DistanceField(source, distances, predecessors)
+
+    def targets_field(self, targets):
+        """
+        Args:
+            targets (np.ndarray): Nx2 target positions
+        """
+        if not len(targets):
+            return TargetsField(np.full(self._shape, np.inf), np.full((*self._shape, 2), -1))
+
+        indices = np.ravel_multi_index(tuple(np.asarray(targets).T), self._shape)
+        distances, _, sources = dijkstra(self._reversed, indices=np.unique(indices), min_only=True, return_predecessors=True)
+        nearest = np.stack(np.unravel_index(np.maximum(sources, 0), self._shape), axis=-1)
+        nearest[sources < 0] = -1
+        return TargetsField(distances.reshape(self._shape), nearest.reshape((*self._shape, 2)))
+
+    def costs(self, field, locations):
+        return field.distances[np.ravel_multi_index(tuple(np.asarray(locations).T), self._shape)]
+
+    def path(self, field, pos_to):
+        """
+        Returns:
+            tuple[list, float]: directions to follow from the field source and total cost of the path
+        """
+        target = np.ravel_multi_index(tuple(pos_to), self._shape)
+        if field.source == target:
+            return [0], 0
+
+        path = [target]
+        while path[-1] != field.source:
+            path.append(field.predecessors[path[-1]])
+        path = path[::-1]
+        return [self._direction(a, b) for a, b in zip(path[:-1], path[1:])], field.distances[target]
+
+    def shortest_path(self, pos_from, pos_to):
+        """
+        Returns:
+            tuple[list, float]: directions to follow and total cost of the path
+        """
+        return self.path(self.distance_field(pos_from), pos_to)
+
+
+PATH_BACKENDS = {
+    "networkx": MovementGraph,
+    "grid": GridPathfinder,
+}
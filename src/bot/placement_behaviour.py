@@ -1,12 +1,19 @@
 import numpy as np
+from scipy.ndimage import distance_transform_edt
+
+from bot.time_budget import TurnBudget
 from lux.utils import my_turn_to_place_factory
 
 
 class PlacementBehaviour:
-    def __init__(self, game_state, manager):
+    # seconds left to the turn deadline when the factory goes to the first valid tile instead of the best scored one
+    scoring_reserve = 0.1
+
+    def __init__(self, game_state, manager, budget=None):
         self.faction_names = {"player_0": "TheBuilders", "player_1": "FirstMars"}
         self.game_state = game_state
         self.manager = manager
+        self.budget = budget or TurnBudget()
         self.player = self.manager.player
         self.opp_player = self.manager.opp_player
 
@@ -16,6 +23,58 @@ class PlacementBehaviour:
         actions["bid"] = 5  # Learnable
         return actions
 
+    @staticmethod
+    def _squared_distance_map(mask):
+        """
+        Mean squared coordinate difference from every tile to the closest tile of the mask
+        """
+        # distances are recomputed from the nearest tile indices to keep them exact integers
+        _, (nearest_x, nearest_y) = distance_transform_edt(~mask, return_indices=True)
+        x, y = np.indices(mask.shape)
+        return ((nearest_x - x) ** 2 + (nearest_y - y) ** 2) / 2
+
+    @staticmethod
+    def _factories_distance_map(factories, shape):
+        """
+        Mean squared coordinate difference from every tile to the closest factory, 0 if there are no factories
+        """
+        if not len(factories):
+            return np.zeros(shape)
+        x, y = np.indices(shape)
+        factories = np.array(factories)
+        return np.min(((x[..., None] - factories[:, 0]) ** 2 + (y[..., None] - factories[:, 1]) ** 2) / 2, axis=2)
+
+    def _rubble_density_map(self, d_rubble):
+        rubble = self.game_state.board.rubble
+        width, height = rubble.shape
+        # summed-area table with a zero row and column in front
+        table = np.zeros((width + 1, height + 1))
+        table[1:, 1:] = rubble.cumsum(axis=0).cumsum(axis=1)
+
+        x, y = np.indices(rubble.shape)
+        # windows as they were sliced before: the upper y bound never goes below the board edge
+        x0, x1 = np.maximum(x - d_rubble, 0), np.minimum(x + d_rubble, width - 1)
+        y0, y1 = np.maximum(y - d_rubble, 0), np.minimum(np.maximum(y + d_rubble, height - 1), height)
+        window_sum = table[x1, y1] - table[x0, y1] - table[x1, y0] + table[x0, y0]
+        return window_sum / ((x1 - x0) * (y1 - y0))
+
+    def score_map(self, my_factories, opp_factories):
+        """
+        Placement score of every tile, lower is better, inf where a factory can't be placed.
+        Factories are passed explicitly, so it can be evaluated for planned placements too.
+        """
+        board = self.game_state.board
+        d_rubble = 10
+
+        scores = (
+            self._squared_distance_map(board.ice == 1) * 10
+            + 0.01 * self._squared_distance_map(board.ore == 1)
+            + 10 * self._rubble_density_map(d_rubble) / (d_rubble)
+            + self._factories_distance_map(opp_factories, board.rubble.shape) * 0.1
+            - self._factories_distance_map(my_factories, board.rubble.shape) * 0.1
+        )
+        return np.where(board.valid_spawns_mask == 1, scores, np.inf)
+
     def _place_factory(self):
         actions = dict()
         game_state = self.game_state
@@ -31,49 +90,13 @@ class PlacementBehaviour:
         # how many factories you have left to place
         factories_to_place = game_state.teams[self.player].factories_to_place
         if factories_to_place > 0:
-            # we will spawn our factory in a random location with 100 metal n water (learnable)
-            potential_spawns = np.array(list(zip(*np.where(game_state.board.valid_spawns_mask == 1))))
-
-            ice_map = game_state.board.ice
-            ore_map = game_state.board.ore
-            ice_tile_locations = np.argwhere(ice_map == 1)  # numpy position of every ice tile
-            ore_tile_locations = np.argwhere(ore_map == 1)  # numpy position of every ice tile
-
-            min_dist = 10e6
-            best_loc = potential_spawns[0]
-
-            d_rubble = 10
-
-            for loc in potential_spawns:
-                ice_tile_distances = np.mean((ice_tile_locations - loc) ** 2, 1)
-                ore_tile_distances = np.mean((ore_tile_locations - loc) ** 2, 1)
-                density_rubble = np.mean(
-                    game_state.board.rubble[
-                        max(loc[0] - d_rubble, 0) : min(loc[0] + d_rubble, 47), max(loc[1] - d_rubble, 0) : max(loc[1] + d_rubble, 47)
-                    ]
-                )
-
-                closes_opp_factory_dist = 0
-                if len(opp_factories) >= 1:
-                    closes_opp_factory_dist = np.min(np.mean((np.array(opp_factories) - loc) ** 2, 1))
-                closes_my_factory_dist = 0
-                if len(my_factories) >= 1:
-                    closes_my_factory_dist = np.min(np.mean((np.array(my_factories) - loc) ** 2, 1))
-
-                minimum_ice_dist = (
-                    np.min(ice_tile_distances) * 10
-                    + 0.01 * np.min(ore_tile_distances)
-                    + 10 * density_rubble / (d_rubble)
-                    + closes_opp_factory_dist * 0.1
-                    - closes_my_factory_dist * 0.1
-                )
-
-                if minimum_ice_dist < min_dist:
-                    min_dist = minimum_ice_dist
-                    best_loc = loc
-
-            #                 spawn_loc = potential_spawns[np.random.randint(0, len(potential_spawns))]
-            spawn_loc = best_loc
+            if self.budget.expired(self.scoring_reserve):
+                # out of time, any tile is better than a missed placement
+                spawn_loc = np.argwhere(game_state.board.valid_spawns_mask == 1)[0]
+            else:
+                scores = self.score_map(my_factories, opp_factories)
+                # first best tile in the x-major order, as potential spawns used to be iterated
+                spawn_loc = np.array(np.unravel_index(np.argmin(scores), scores.shape))
             actions["spawn"] = spawn_loc
             actions["metal"] = min(150, metal_left) if factories_to_place > 1 else metal_left
             actions["water"] = min(150, water_left) if factories_to_place > 1 else water_left
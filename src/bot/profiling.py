@@ -0,0 +1,91 @@
+import atexit
+import json
+import time
+from collections import defaultdict
+from functools import wraps
+
+# profilers of the matches not dumped yet, one exit hook writes them all however many agents the process has run
+_open_profilers = set()
+
+
+@atexit.register
+def _dump_open_profilers():
+    for profiler in list(_open_profilers):
+        profiler.dump_match()
+
+
+class HotPathProfiler:
+    """
+    Counts calls and wall time of the hot path methods, enabled with PROFILE_HOTPATHS=<dir>.
+    Methods are wrapped on the instances, so nothing is paid when profiling is off and several agents
+    in one process don't mix their numbers.
+
+    Every turn is written as a line of <dir>/<player>.jsonl, totals for the match go to <dir>/<player>_match.json
+    after the last turn, when the agent is closed or when the process exits.
+    """
+
+    def __init__(self, path, summary_path):
+        self.path = path
+        self.summary_path = summary_path
+        self.turn = defaultdict(lambda: [0, 0.0])
+        self.match = defaultdict(lambda: {"calls": 0, "time": 0.0, "max_turn_time": 0.0})
+        self.turns = 0
+        self._dumped = False
+        open(path, "w").close()
+        _open_profilers.add(self)
+
+    def wrap(self, name, func):
+        stats = self.turn
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            t = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                entry = stats[name]
+                entry[0] += 1
+                entry[1] += time.perf_counter() - t
+
+        return timed
+
+    def instrument(self, obj, names, prefix=""):
+        """
+        Replaces the methods of the object with the timed ones, calls inside of the object go through them as well
+        """
+        for name in names:
+            setattr(obj, name, self.wrap(prefix + name.lstrip("_"), getattr(obj, name)))
+        return obj
+
+    def count(self, name, n=1):
+        """
+        Counter without timing, e.g. retries inside of a method
+        """
+        self.turn[name][0] += n
+
+    def end_turn(self, step, last=False):
+        stats = {name: {"calls": calls, "time": elapsed} for name, (calls, elapsed) in sorted(self.turn.items())}
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"step": step, "stats": stats}) + "\n")
+
+        for name, entry in stats.items():
+            total = self.match[name]
+            total["calls"] += entry["calls"]
+            total["time"] += entry["time"]
+            total["max_turn_time"] = max(total["max_turn_time"], entry["time"])
+        self.turn.clear()
+        self.turns += 1
+        if last:
+            self.dump_match()
+
+    def dump_match(self):
+        _open_profilers.discard(self)
+        if self._dumped or not self.turns:
+            return
+        self._dumped = True
+        summary = {
+            name: {**total, "time_per_call": total["time"] / max(total["calls"], 1), "time_per_turn": total["time"] / self.turns}
+            for name, total in sorted(self.match.items(), key=lambda item: -item[1]["time"])
+        }
+        with open(self.summary_path, "w") as f:
+            json.dump({"turns": self.turns, "stats": summary}, f, indent=2)
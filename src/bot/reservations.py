@@ -0,0 +1,89 @@
+import numpy as np
+
+from bot.action_queue import MOVE, predict_queue
+from lux.unit import move_deltas
+
+FREE = -1
+
+
+def queue_directions(queue, horizon):
+    """
+    Directions the unit moves in on every turn of the queue, 0 for the turns it stays (digging, transfer etc.)
+
+    Args:
+        queue: action queue, rows are [type, direction, resource, amount, repeat, n]
+        horizon (int): max number of turns to expand
+    """
+    return [direction if action_type == MOVE else 0 for action_type, direction, _ in predict_queue(queue, horizon)]
+
+
+class ReservationTable:
+    """
+    Cells occupied by own robots at every turn offset: 0 is the current turn, 1 the next one and so on.
+    Every cell keeps the slot of the robot which reserved it, so a robot never collides with itself.
+
+    Until a robot plans its moves it is expected to stay, so its current cell is reserved for the next turn.
+    """
+
+    def __init__(self, shape, horizon=5):
+        self.horizon = horizon
+        self.table = np.full((horizon + 1, *shape), FREE, dtype=np.int16)
+        self.slots = {}
+        self._reserved = {}
+
+    def reset(self, positions):
+        """
+        Args:
+            positions (dict): unit_id -> current position of every own robot
+        """
+        self.table.fill(FREE)
+        self.slots = {unit_id: slot for slot, unit_id in enumerate(positions)}
+        self._reserved = {}
+        for unit_id, pos in positions.items():
+            x, y = pos
+            self.table[0, x, y] = self.slots[unit_id]
+            self.reserve_path(unit_id, pos, [0])
+
+    def _release(self, unit_id):
+        for t, x, y in self._reserved.pop(unit_id, []):
+            if self.table[t, x, y] == self.slots[unit_id]:
+                self.table[t, x, y] = FREE
+
+    def reserve_path(self, unit_id, pos, directions):
+        """
+        Replaces the future reservations of the robot with the cells along the directions
+        """
+        self._release(unit_id)
+        slot = self.slots[unit_id]
+        width, height = self.table.shape[1:]
+        cells = []
+        x, y = pos
+        for t, direction in enumerate(directions[: self.horizon], start=1):
+            dx, dy = move_deltas[direction]
+            if 0 <= x + dx < width and 0 <= y + dy < height:
+                x, y = x + dx, y + dy
+            self.table[t, x, y] = slot
+            cells.append((t, x, y))
+        self._reserved[unit_id] = cells
+
+    def is_free(self, t, pos, unit_id=None):
+        """
+        Whether the cell is not reserved by any other robot at the turn offset.
+        Cells outside of the map are free, the move cost check rejects them
+        """
+        x, y = pos
+        width, height = self.table.shape[1:]
+        if not (0 <= x < width and 0 <= y < height):
+            return True
+        owner = self.table[t, x, y]
+        return owner == FREE or owner == self.slots.get(unit_id)
+
+    def is_path_free(self, pos, directions, unit_id=None):
+        """
+        Whether the robot can follow the directions without entering cells reserved by others
+        """
+        for t, direction in enumerate(directions[: self.horizon], start=1):
+            pos = np.add(pos, move_deltas[direction])
+            if not self.is_free(t, pos, unit_id):
+                return False
+        return True
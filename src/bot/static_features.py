@@ -0,0 +1,72 @@
+import numpy as np
+
+
+def get_3x3_indices(pos):
+    indices = np.indices((3, 3)) - 1  # create array of indices with center at (1,1)
+    shift = pos.reshape(-1, 1, 1)  # reshape shift array for broadcasting
+    indices = indices + shift  # shift indices to center at (x,y)
+    indices = indices.reshape(2, -1).T  # flatten indices and return as Nx2 array
+    return indices
+
+
+class StaticFeatures:
+    """
+    Episode-level store of the board features, which never change (resources)
+    or change only when a factory is destroyed (factory tiles and neighbourhoods).
+    """
+
+    def __init__(self, player) -> None:
+        self.player = player
+        self.opp_player = "player_1" if self.player == "player_0" else "player_0"
+        self._factories_key = None
+
+        self.ice_mask = None
+        self.ore_mask = None
+        self.ice_locations = None
+        self.ore_locations = None
+
+    def _refresh_resources(self, game_state):
+        self.ice_mask = game_state.board.ice >= 1
+        self.ore_mask = game_state.board.ore >= 1
+        self.ice_locations = np.argwhere(self.ice_mask)  # numpy position of every ice tile
+        self.ore_locations = np.argwhere(self.ore_mask)  # numpy position of every ore tile
+
+    def _refresh_factories(self, game_state):
+        map_size = game_state.env_cfg.map_size
+        factories = game_state.factories[self.player]
+
+        self.factory_ids = list(factories)
+        self.factory_tiles = np.array([factory.pos for factory in factories.values()])  # Factory locations (to go back to)
+
+        self.enemy_factory_tiles = {
+            tuple(xy) for factory in game_state.factories[self.opp_player].values() for xy in get_3x3_indices(factory.pos).tolist()
+        }
+        self.enemy_factory_mask = np.zeros((map_size, map_size), dtype=bool)
+        if self.enemy_factory_tiles:
+            self.enemy_factory_mask[tuple(np.array(list(self.enemy_factory_tiles)).T)] = True
+
+        # Manhattan distances from every tile to every own factory center
+        x, y = np.indices((map_size, map_size))
+        factory_x, factory_y = self.factory_tiles.reshape(-1, 2).T
+        self.factories_distances = np.abs(x[..., None] - factory_x) + np.abs(y[..., None] - factory_y)
+        # distance to the closest one, inf if there are no factories
+        if len(self.factory_tiles):
+            self.factories_distance_map = self.factories_distances.min(axis=2)
+        else:
+            self.factories_distance_map = np.full((map_size, map_size), np.inf)
+
+        self.factories_neigborhood = self.get_factories_neigborhood(7)
+
+    def get_factories_neigborhood(self, dist):
+        is_near_factory = np.any(self.factories_distances == dist, axis=2)
+        # (x, y) points ordered by y first, as they used to come from the meshgrid
+        return np.argwhere(is_near_factory.T)[:, ::-1]
+
+    def refresh(self, game_state):
+        if self.ice_mask is None:
+            self._refresh_resources(game_state)
+
+        factories_key = tuple(tuple(game_state.factories[player]) for player in (self.player, self.opp_player))
+        if factories_key != self._factories_key:
+            self._refresh_factories(game_state)
+            self._factories_key = factories_key
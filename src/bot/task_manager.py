@@ -17,6 +17,8 @@ class TaskManager:
         self.bot_factory = {}
         self.bot_targets = {}
         self.factory_queue = defaultdict(list)
+        # power robots didn't spend on new action queues since the start of the match
+        self.queue_power_saved = 0
 
     def refresh(self, map_state):
         self.map_state = map_state
@@ -0,0 +1,42 @@
+import time
+
+
+class TurnBudget:
+    """
+    Wall time the agent may spend on the current turn: the step time of the env plus an even share
+    of the remaining overage time for the turns left, minus a safety margin for the time spent outside of the agent
+    (reading and writing observations, the runner itself).
+
+    Expensive stages check expired() with their own reserve and fall back to cheaper behaviour, e.g.
+    robots with a queue keep following it instead of planning again.
+    """
+
+    def __init__(self, step_time=3.0, safety_margin=0.5, max_steps=1000, clock=time.perf_counter):
+        self.step_time = step_time
+        self.safety_margin = safety_margin
+        self.max_steps = max_steps
+        self.clock = clock
+        self.started = clock()
+        self.deadline = self.started + step_time - safety_margin
+
+    def start_turn(self, remaining_overage, step):
+        """
+        Args:
+            remaining_overage (float): remainingOverageTime of the observation, seconds
+            step (int): real env step of the turn
+        """
+        turns_left = max(self.max_steps - step, 1)
+        self.started = self.clock()
+        self.deadline = self.started + self.step_time + max(remaining_overage, 0) / turns_left - self.safety_margin
+
+    def elapsed(self):
+        return self.clock() - self.started
+
+    def remaining(self):
+        return self.deadline - self.clock()
+
+    def expired(self, reserve=0.0):
+        """
+        Whether less than `reserve` seconds are left until the deadline
+        """
+        return self.remaining() < reserve
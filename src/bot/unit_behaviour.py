@@ -1,13 +1,16 @@
-import itertools
 import logging
+import math
 from collections import Counter
 from typing import NamedTuple
 
 import numpy as np
 
+from bot.action_queue import ActionQueue, predict_route
 from bot.logging import BehaviourLoggingAdapter
 from bot.task_manager import TaskManager
 from bot.map_manager import MapManager
+from bot.reservations import queue_directions
+from lux.config import EnvConfig
 from lux.kit import GameState
 from lux.unit import Unit, move_deltas
 from lux.utils import direction_to
@@ -24,19 +27,38 @@ class FoundPath(NamedTuple):
 
 
 class UnitBehaviour:
-    # __registry = {}
+    """
+    Created once per unit and kept while the unit is alive, refresh() has to be called every turn before act()
+    """
+
+    # seconds left to the turn deadline when get_direction stops trying alternative tiles
+    fallback_reserve = 0.5
+    # turns of the predicted execution over which the current queue of the unit may take another route
+    # to the same tile and still be kept, see _should_continue_queue
+    queue_horizon = 3
+
+    def __init__(self, unit: Unit, env_cfg: EnvConfig, manager: TaskManager):
+        self.unit_id = unit.unit_id
+        self.manager = manager
+
+        logger = logging.getLogger(__class__.__name__)
+
+        # Create adapter with custom prefix
+        self.logger = BehaviourLoggingAdapter(logger, {"behaviour": self})
+
+        unit_cfg = env_cfg.ROBOTS[unit.unit_type]
+        self.battery_capacity = unit_cfg.BATTERY_CAPACITY
+        self.cargo_space = unit_cfg.CARGO_SPACE
+        self.def_move_cost = unit_cfg.MOVE_COST
+        self.rubble_dig_cost = unit_cfg.DIG_COST
 
-    # def __new__(cls, unit: Unit, *args, **kwargs):
-    #     if unit.unit_id not in cls.__registry:
-    #         cls.__registry[unit.unit_id] = super(UnitBehaviour, cls).__new__(cls)
-    #     return cls.__registry[unit.unit_id]
+        # new action queue of the turn, the buffer is reused every turn
+        self.actions = ActionQueue(env_cfg.UNIT_ACTION_QUEUE_SIZE)
 
-    def __init__(self, unit: Unit, game_state: GameState, manager: TaskManager, map_state: MapManager):
+    def refresh(self, unit: Unit, game_state: GameState, map_state: MapManager):
         self.unit = unit
-        self.unit_id = self.unit.unit_id
 
         self.game_state = game_state
-        self.manager = manager
         self.map_state = map_state
 
         self.closest_factory_tile = self.manager.register_bot(self.unit_id, unit)
@@ -45,48 +67,56 @@ class UnitBehaviour:
 
         self.target = self.manager.bot_targets.get(self.unit_id)
 
-        logger = logging.getLogger(__class__.__name__)
-
-        # Create adapter with custom prefix
-        self.logger = BehaviourLoggingAdapter(logger, {"behaviour": self})
-
-        unit_cfg = self.game_state.env_cfg.ROBOTS[unit.unit_type]
-        self.battery_capacity = unit_cfg.BATTERY_CAPACITY
-        self.cargo_space = unit_cfg.CARGO_SPACE
-        self.def_move_cost = unit_cfg.MOVE_COST
-        self.rubble_dig_cost = unit_cfg.DIG_COST
-
-        self.actions = []
+        self.actions.clear()
 
     def get_direction(self, unit, sorted_tiles) -> FoundPath:
         closest_tile = np.array(sorted_tiles[0])
+        budget = self.map_state.budget
+        directions = None
+        if self.map_state.planner is not None:
+            directions = self.map_state.get_plan(unit.unit_id, closest_tile)
+            if directions is None and not budget.expired(self.map_state.planning_reserve):
+                directions = self.map_state.plan_path(unit.unit_id, unit.pos, closest_tile, unit.unit_type)
+        if directions is not None:
+            # cooperative mode, collisions are resolved by the planner, alternative tiles are not needed
+            self.logger.info("%s, %s, planned directions, %s", unit.pos, closest_tile, directions)
+            return FoundPath(closest_tile, directions, True)
+
         path = FoundPath(closest_tile, self.map_state.shortest_path(unit.pos, closest_tile))
         # direction = direction_to(np.array(unit.pos), closest_tile)
         k = 0
         unit_type = unit.unit_type
-        self.logger.debug(f"get_direction: {path.direction}")
-
-        while self.map_state.check_collision(np.array(unit.pos), path.direction, unit_type) and k < min(len(sorted_tiles) - 1, 500):
+        self.logger.debug("get_direction: %s", path.direction)
+
+        max_k = min(len(sorted_tiles) - 1, 500)
+        while self.map_state.check_collision(np.array(unit.pos), path.direction, unit_type, unit.unit_id) and k < max_k:
+            if budget.expired(self.fallback_reserve):
+                # every alternative is one more shortest path, the neighbours search below is cheap
+                self.logger.info("out of time, stop searching alternatives")
+                break
             k += 1
             alternative_tile = np.array(sorted_tiles[k])
             path = FoundPath(alternative_tile, self.map_state.shortest_path(unit.pos, alternative_tile), True)
             # direction = direction_to(np.array(unit.pos), alternative_tile)
-            self.logger.debug(f"get_direction change: {path.direction}")
+            self.logger.debug("get_direction change: %s", path.direction)
+
+        if self.map_state.profiler:
+            self.map_state.profiler.count("get_direction_retries", k)
 
-        if self.map_state.check_collision(unit.pos, path.direction, unit_type):
+        if self.map_state.check_collision(unit.pos, path.direction, unit_type, unit.unit_id):
             for direction_x in np.arange(4, -1, -1):
-                if not self.map_state.check_collision(np.array(unit.pos), direction_x, unit_type):
+                if not self.map_state.check_collision(np.array(unit.pos), direction_x, unit_type, unit.unit_id):
                     path = FoundPath(closest_tile, [direction_x], True)
-                    self.logger.debug(f"get_direction change search: {direction_x}")
+                    self.logger.debug("get_direction change search: %s", direction_x)
                     break
 
-        # TODO why this is even possible? Previous block should avoid any collisions by choosing direction 0
-        if self.map_state.check_collision(np.array(unit.pos), path.direction, unit_type):
+        # all the neighbours and the own tile are taken by robots which have already planned their moves
+        if self.map_state.check_collision(np.array(unit.pos), path.direction, unit_type, unit.unit_id):
             direction = np.random.choice(np.arange(5))
             path = FoundPath(closest_tile, [direction], True)
-            self.logger.debug(f"get_direction change finally: {path.direction}")
+            self.logger.debug("get_direction change finally: %s", path.direction)
 
-        self.logger.info(f"{unit.pos}, {closest_tile}, directions, {path.directions}")
+        self.logger.info("%s, %s, directions, %s", unit.pos, closest_tile, path.directions)
 
         return path
 
@@ -100,9 +130,9 @@ class UnitBehaviour:
         # check move_cost is not None, meaning that direction is not blocked
         # check if unit has enough power to move and update the action queue.
         if move_cost is not None:  # and unit.power >= move_cost + unit.action_queue_cost(game_state):
-            self.actions += [unit.move(d, repeat=False, n=len(list(gr))) for d, gr in itertools.groupby(path.directions)]
+            self.actions.moves(path.directions)
             self.manager.bot_targets[self.unit_id] = path.target
-            self.logger.info(f"new movement queue {path.directions} {self.actions}")
+            self.logger.info("new movement queue %s %s", path.directions, self.actions)
 
     def _return_to_factory(self):
         """
@@ -121,13 +151,13 @@ class UnitBehaviour:
 
         self.task.action = "continue"
         if unit.cargo.ice > 0:
-            self.actions += [unit.transfer(0, 0, unit.cargo.ice, repeat=False)]
+            self.actions.transfer(0, 0, unit.cargo.ice)
             self.logger.info("transfer ice")
         elif unit.cargo.ore > 0:
-            self.actions += [unit.transfer(0, 1, unit.cargo.ore, repeat=False)]
+            self.actions.transfer(0, 1, unit.cargo.ore)
             self.logger.info("transfer ore")
         elif unit.power < self.battery_capacity * 0.1:
-            self.actions += [unit.pickup(4, self.battery_capacity - unit.power)]
+            self.actions.pickup(4, self.battery_capacity - unit.power)
             self.logger.info("pickup power")
 
     def _task_ice(self):
@@ -144,13 +174,14 @@ class UnitBehaviour:
         ):
             # compute the distance to each ice tile from this unit and pick the closest
 
-            sorted_ice = self.map_state.get_tiles_distances(unit.pos, "ice")[0]
+            closest_ice, cost = self.map_state.get_closest_target(unit.pos, "ice")
             # if we have reached the ice tile, start mining if possible
-            if not (sorted_ice == unit.pos).all(1).any():
+            if cost > 0:
                 self.logger.info("move to ice")
-                self._move_to(sorted_ice)
+                # the closest tile by movement cost first, the rest are alternatives for get_direction
+                self._move_to([closest_ice, *self.map_state.get_tiles_distances(unit.pos, "ice")[0]])
                 # if unit.power >= unit.dig_cost(game_state) + unit.action_queue_cost(game_state):
-            self.actions += [unit.dig(repeat=True)]
+            self.actions.dig(repeat=True)
             self.logger.info("reached ice, dig")
 
         elif (
@@ -169,13 +200,14 @@ class UnitBehaviour:
             # and self.task.action != "return"
         ):
             # compute the distance to each ore tile from this unit and pick the closest
-            sorted_ore = self.map_state.get_tiles_distances(unit.pos, "ore")[0]
+            closest_ore, cost = self.map_state.get_closest_target(unit.pos, "ore")
             # if we have reached the ore tile, start mining if possible
-            if not (sorted_ore == unit.pos).all(1).any():
+            if cost > 0:
                 self.logger.info("move to ore")
-                self._move_to(sorted_ore)
+                # the closest tile by movement cost first, the rest are alternatives for get_direction
+                self._move_to([closest_ore, *self.map_state.get_tiles_distances(unit.pos, "ore")[0]])
                 # if unit.power >= unit.dig_cost(game_state) + unit.action_queue_cost(game_state):
-            self.actions += [unit.dig(repeat=True)]
+            self.actions.dig(repeat=True)
             self.logger.info("ore reached, dig")
 
         elif (
@@ -193,7 +225,7 @@ class UnitBehaviour:
                 self.logger.info("move to opponent lichen")
                 self._move_to(sorted_ore)
                 # if unit.power >= unit.dig_cost(game_state) + unit.action_queue_cost(game_state):
-            self.actions += [unit.dig(repeat=True)]
+            self.actions.dig(repeat=True)
             self.logger.info("opponent lichen reached, dig")
 
         elif (
@@ -217,7 +249,6 @@ class UnitBehaviour:
             self.logger.info("move to border")
             self._move_to(sorted_tiles)
             # if unit.power >= unit.dig_cost(game_state) + unit.action_queue_cost(game_state):
-        self.actions += []
         self.logger.info("border reached, wait")
 
         # elif (
@@ -244,7 +275,7 @@ class UnitBehaviour:
                     self.logger.info("move to rubble")
                     self._move_to(sorted_rubble)
                     # if unit.power >= unit.dig_cost(game_state) + unit.action_queue_cost(game_state):
-                self.actions += [unit.dig(repeat=True)]
+                self.actions.dig(repeat=True)
                 self.logger.info("rubble reached, dig")
             else:
                 self.logger.info("no tiles to dig")
@@ -262,11 +293,12 @@ class UnitBehaviour:
         if unit.unit_type == "HEAVY" and enemy.unit_type == "LIGHT":
             return True
 
-        path = self.map_state.shortest_path(unit.pos, enemy.pos)
-        move_cost = self.map_state.shortest_path_cost(unit.pos, enemy.pos)
+        path, move_cost = self.map_state.shortest_path_with_cost(unit.pos, enemy.pos)
         move_cost = (move_cost / 20) if unit.unit_type == "LIGHT" else move_cost
 
-        new_queue = self._should_continue_queue([unit.move(path[0])])
+        probe = ActionQueue(1)
+        probe.move(path[0])
+        new_queue = self._should_continue_queue(probe)
         queue_cost = 0 if new_queue else unit.action_queue_cost(self.game_state)
         return unit.power - queue_cost - move_cost > enemy.power
 
@@ -285,7 +317,7 @@ class UnitBehaviour:
                 dist = 2 * dist_enemy - dist_factory
 
                 candidates = adjacent_tiles[np.argsort(dist)][::-1]
-                self.logger.info(f"candidates: {candidates}", )
+                self.logger.info("candidates: %s", candidates)
                 self._move_to(candidates)
             else:
                 self._return_to_factory()
@@ -295,7 +327,8 @@ class UnitBehaviour:
     def _enemy_is_near(self):
         unit = self.unit
 
-        opp_pos, opponent_unit_distances = self.map_state.get_tiles_distances(unit.pos, "enemy")
+        # _fight reacts only to the enemies within 2 tiles
+        opp_pos, opponent_unit_distances = self.map_state.get_enemies_within(unit.pos, 2)
 
         if len(opp_pos) != 0:
             min_distance = opponent_unit_distances[0]
@@ -326,24 +359,71 @@ class UnitBehaviour:
             self._task_rubble()
 
     def _should_continue_queue(self, actions):
-        return (
-            len(self.unit.action_queue)
-            and len(actions)  # it will be empty, if unit is out of power
-            and np.all(self.unit.action_queue[0, :3] == actions[0][:3])
+        # actions will be empty, if unit is out of power
+        if not len(actions):
+            return False
+        queue = self.unit.action_queue
+        if actions.same_next_action(queue):
+            return True
+        saving = self._kept_queue_saving(actions)
+        return saving is not None and saving > 0
+
+    def _kept_queue_saving(self, actions):
+        """
+        The current queue gets to the same tile doing the same things as the new one, maybe on another route.
+        Keeping it saves the queue cost, minus the extra power its route takes.
+
+        Returns:
+            power saved by keeping the current queue, None if it can't be kept
+        """
+        queue = self.unit.action_queue
+        if not actions.same_outcome(queue, self.unit.pos, self.queue_horizon) or not self._is_queue_free(queue):
+            return None
+        return self.unit.action_queue_cost(self.game_state) - (self._route_power(queue) - self._route_power(actions))
+
+    def _route_power(self, queue):
+        """
+        Power of the moves of the queue over queue_horizon turns, with rubble as it is now
+        """
+        unit_cfg = self.unit.unit_cfg
+        rubble = self.game_state.board.rubble
+        width, height = rubble.shape
+        return sum(
+            math.floor(unit_cfg.MOVE_COST + unit_cfg.RUBBLE_MOVEMENT_COST * rubble[x, y])
+            for x, y in predict_route(queue, self.unit.pos, self.queue_horizon)
+            if 0 <= x < width and 0 <= y < height
         )
 
+    def _is_queue_free(self, queue):
+        directions = queue_directions(queue, self.map_state.reservations.horizon) or [0]
+        if self.map_state.check_collision(np.array(self.unit.pos), directions[0], self.unit.unit_type, self.unit_id):
+            return False
+        return self.map_state.reservations.is_path_free(self.unit.pos, directions, self.unit_id)
+
+    def keep_queue(self):
+        """
+        Cheap turn without planning, the unit keeps executing its current action queue
+        """
+        self.logger.info("keep queue %s", self.unit.action_queue)
+        self._update_botpos(self.unit.action_queue)
+
     def _update_botpos(self, queue, is_new=False):
         self.logger.info("_update_botpos %s", queue)
-        if queue[0][0] != 0:
-            return
+        reservations = self.map_state.reservations
+        directions = queue_directions(queue, reservations.horizon) or [0]
+
+        if directions[0] != 0:
+            direction = directions[0]
+            move_cost = self.unit.move_cost(self.game_state, direction)
+            if is_new:
+                move_cost += self.unit.action_queue_cost(self.game_state)
 
-        direction = queue[0][1]
-        move_cost = self.unit.move_cost(self.game_state, direction)
-        if is_new:
-            move_cost += self.unit.action_queue_cost(self.game_state)
+            if move_cost is None or self.unit.power < move_cost:
+                # the unit stays, its tile is reserved already
+                return
+            self.map_state.move_bot(self.unit_id, np.array(self.unit.pos) + move_deltas[direction])
 
-        if self.unit.power >= move_cost:
-            self.map_state.botpos[self.unit.unit_id] = tuple(np.array(self.unit.pos) + move_deltas[direction])
+        self.map_state.reserve_path(self.unit_id, self.unit.pos, directions)
 
     def act(self):
         # Assigning task for the bot
@@ -352,7 +432,7 @@ class UnitBehaviour:
         unit_id = self.unit.unit_id
         unit = self.unit
 
-        self.logger.info(f"{self.unit} current action queue: {self.unit.action_queue}, task: {self.manager.bots.get(unit_id)}")
+        self.logger.info("%s current action queue: %s, task: %s", self.unit, self.unit.action_queue, self.manager.bots.get(unit_id))
 
         self.distance_to_factory = np.mean(np.subtract(self.closest_factory_tile, unit.pos) ** 2)
         self.adjacent_to_factory = self.distance_to_factory <= 1
@@ -376,11 +456,17 @@ class UnitBehaviour:
 
         if self._should_continue_queue(self.actions):
             self.logger.info("continue queue")
+            if not self.actions.same_next_action(self.unit.action_queue):
+                # the next action check alone would have submitted the new queue
+                saved = self._kept_queue_saving(self.actions)
+                self.manager.queue_power_saved += saved
+                if self.map_state.profiler:
+                    self.map_state.profiler.count("queue_power_saved", saved)
             self._update_botpos(self.unit.action_queue)
             actions = {}
 
         elif self.actions:
-            actions = {unit_id: self.actions[:20]}
+            actions = {unit_id: self.actions.tolist()}
             self._update_botpos(self.actions, is_new=True)
 
         return actions
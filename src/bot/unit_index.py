@@ -0,0 +1,104 @@
+import numpy as np
+
+EMPTY = -1
+UNIT_TYPES = ("LIGHT", "HEAVY")
+
+
+class UnitIndex:
+    """
+    Occupancy grids of the units per player and unit type, every cell keeps the slot of the unit on it or EMPTY.
+    Slots follow the order of the units in the observation, so lookups keep the order of dict based code.
+    """
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.grids = {}
+        self.slots = {}
+        self.unit_ids = []
+        self.positions = {}
+
+    def reset(self, units):
+        """
+        Args:
+            units: player -> unit_id -> Unit, all the units on the board
+        """
+        self.slots = {}
+        self.unit_ids = []
+        self.positions = {}
+        self.grids = {}
+        for player, player_units in units.items():
+            self.grids[player] = {unit_type: np.full(self.shape, EMPTY, dtype=np.int16) for unit_type in UNIT_TYPES}
+            for unit_id, unit in player_units.items():
+                slot = len(self.unit_ids)
+                self.slots[unit_id] = slot
+                self.unit_ids.append(unit_id)
+                self.positions[unit_id] = (player, unit.unit_type, tuple(unit.pos))
+                self.grids[player][unit.unit_type][tuple(unit.pos)] = slot
+
+    def move(self, unit_id, pos):
+        player, unit_type, old_pos = self.positions[unit_id]
+        grid = self.grids[player][unit_type]
+        if grid[old_pos] == self.slots[unit_id]:
+            grid[old_pos] = EMPTY
+        pos = tuple(pos)
+        grid[pos] = self.slots[unit_id]
+        self.positions[unit_id] = (player, unit_type, pos)
+
+    def _grid(self, player, unit_type=None, window=(slice(None), slice(None))):
+        grids = self.grids[player]
+        if unit_type is not None:
+            return grids[unit_type][window]
+        return np.maximum(grids["LIGHT"][window], grids["HEAVY"][window])
+
+    def occupied(self, player, unit_type=None):
+        """
+        Returns:
+            np.ndarray: (W, H) mask of the cells with units of the player
+        """
+        return self._grid(player, unit_type) != EMPTY
+
+    def unit_at(self, player, pos, unit_type=None):
+        """
+        Returns:
+            str: id of the unit of the player on the cell, None if there is no unit or the cell is outside of the map
+        """
+        x, y = pos
+        if not (0 <= x < self.shape[0] and 0 <= y < self.shape[1]):
+            return None
+        for grid in [self.grids[player][unit_type]] if unit_type else self.grids[player].values():
+            if grid[x, y] != EMPTY:
+                return self.unit_ids[grid[x, y]]
+        return None
+
+    def locations(self, player, mask=None):
+        """
+        Returns:
+            np.ndarray: Nx2 positions of the units of the player, in the observation order, optionally only within the mask
+        """
+        grid = self._grid(player)
+        occupied = grid != EMPTY
+        if mask is not None:
+            occupied &= mask
+        cells = np.argwhere(occupied)
+        return cells[np.argsort(grid[occupied], kind="stable")]
+
+    def within(self, player, pos, radius, mask=None):
+        """
+        Units of the player within the manhattan distance from the position, the square around it is sliced out of the grid
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Nx2 positions sorted by the distance, and the distances
+        """
+        x, y = pos
+        x0, y0 = max(x - radius, 0), max(y - radius, 0)
+        window = (slice(x0, x + radius + 1), slice(y0, y + radius + 1))
+        grid = self._grid(player, window=window)
+        occupied = grid != EMPTY
+        if mask is not None:
+            occupied &= mask[window]
+        cells = np.argwhere(occupied)
+        cells = cells[np.argsort(grid[occupied], kind="stable")] + (x0, y0)
+        distances = np.sum(np.abs(cells - (x, y)), 1)
+        cells, distances = cells[distances <= radius], distances[distances <= radius]
+        idx = np.argsort(distances, kind="stable")
+        return cells[idx], distances[idx]
@@ -43,8 +43,7 @@ class Factory:
         """
         Water required to perform water action
         """
-        owned_lichen_tiles = (game_state.board.lichen_strains == self.strain_id).sum()
-        return np.ceil(owned_lichen_tiles / self.env_cfg.LICHEN_WATERING_COST_FACTOR)
+        return game_state.get_lichen_index().water_cost(self.strain_id)
     def can_water(self, game_state):
         return self.cargo.water >= self.water_cost(game_state)
     def water(self):
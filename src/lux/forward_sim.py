@@ -1,27 +1,144 @@
+import copy
+import dataclasses
+from typing import NamedTuple
+
+import numpy as np
+
+PLAYERS = ("player_0", "player_1")
+
+
+class SimulationResult(NamedTuple):
+    """
+    Outcome of every simulated candidate, the first axis is the candidate, the second one is the player
+    """
+
+    rewards: np.ndarray  # (B, 2) env rewards after the last step, -1000 for a lost player
+    done: np.ndarray  # (B,) whether the episode has ended during the simulation
+    steps: np.ndarray  # (B,) number of simulated steps
+    factories: np.ndarray  # (B, 2) number of factories
+    units: np.ndarray  # (B, 2) number of robots
+    water: np.ndarray  # (B, 2) water stored in factories
+    metal: np.ndarray  # (B, 2) metal stored in factories
+    power: np.ndarray  # (B, 2) power of factories and robots
+    lichen: np.ndarray  # (B, W, H) lichen map
+    lichen_strains: np.ndarray  # (B, W, H) lichen strains map
+
+
+class ForwardSimulator:
+    """
+    Keeps warm env instances to simulate many candidate actions from the same root state.
+    The root is built from the observation once, every candidate starts from its copy.
+    """
+
+    def __init__(self, pool_size=1):
+        self.pool_size = pool_size
+        self._pool = []
+
+    def _acquire(self):
+        if self._pool:
+            return self._pool.pop()
+        from luxai_s2 import LuxAI_S2
+
+        return LuxAI_S2(collect_stats=False, verbose=0)
+
+    def _release(self, env):
+        if len(self._pool) < self.pool_size:
+            self._pool.append(env)
+
+    def snapshot(self, full_obs, env_cfg):
+        """
+        Root state to simulate from
+
+        Args:
+            full_obs: full (not delta) observation, as kept by process_obs
+            env_cfg: env config of the game
+        """
+        from luxai_s2.state import State
+
+        env_cfg = dataclasses.replace(env_cfg, verbose=0)
+        state = State.from_obs(full_obs, env_cfg)
+        # from_obs doesn't restore lichen, though factories need it to grow and connect lichen
+        state.board.lichen = np.array(full_obs["board"]["lichen"])
+        state.board.lichen_strains = np.array(full_obs["board"]["lichen_strains"])
+        return state
+
+    def restore(self, env, snapshot):
+        env.set_state(copy.deepcopy(snapshot))
+        env.agents = list(PLAYERS)
+        return env
+
+    @staticmethod
+    def _format_actions(actions):
+        return {player: {unit_id: np.asarray(action) for unit_id, action in actions.get(player, {}).items()} for player in PLAYERS}
+
+    def simulate(self, snapshot, candidates, n=1):
+        """
+        Args:
+            snapshot: root state from `snapshot`
+            candidates: list of actions `{player: {unit_id: action}}` submitted on the first step,
+                or list of such actions for every step, units keep executing their queues afterwards
+            n: number of steps to simulate
+
+        Returns:
+            SimulationResult: arrays with a row per candidate
+        """
+        env = self._acquire()
+        try:
+            rows = [self._simulate_one(self.restore(env, snapshot), candidate, n) for candidate in candidates]
+        finally:
+            self._release(env)
+        return SimulationResult(*(np.array(values) for values in zip(*rows)))
+
+    def _simulate_one(self, env, candidate, n):
+        steps_actions = candidate if isinstance(candidate, (list, tuple)) else [candidate]
+        rewards = dict.fromkeys(PLAYERS, 0)
+        done = False
+        steps = 0
+        for step in range(n):
+            actions = self._format_actions(steps_actions[step] if step < len(steps_actions) else {})
+            _, rewards, dones, _ = env.step(actions)
+            steps += 1
+            if any(dones.values()):
+                done = True
+                break
+        return self._summarize(env.state, rewards, done, steps)
+
+    @staticmethod
+    def _summarize(state, rewards, done, steps):
+        factories = [state.factories[player].values() for player in PLAYERS]
+        units = [state.units[player].values() for player in PLAYERS]
+        return (
+            [rewards.get(player, 0) for player in PLAYERS],
+            done,
+            steps,
+            [len(f) for f in factories],
+            [len(u) for u in units],
+            [sum(factory.cargo.water for factory in f) for f in factories],
+            [sum(factory.cargo.metal for factory in f) for f in factories],
+            [sum(factory.power for factory in f) + sum(unit.power for unit in u) for f, u in zip(factories, units)],
+            state.board.lichen.copy(),
+            state.board.lichen_strains.copy(),
+        )
+
+
+_simulator = ForwardSimulator()
+
+
 def forward_sim(full_obs, env_cfg, n=2):
     """
     Forward sims for `n` steps given the current full observation and env_cfg
 
     If forward sim leads to the end of a game, it won't return any additional observations, just the original one
     """
-    from luxai_s2 import LuxAI_S2
-    from luxai_s2.config import UnitConfig
-    import copy
-    agent = "player_0"
-    env = LuxAI_S2(collect_stats=False, verbose=0)
-    env.reset(seed=0)
-    env.state = env.state.from_obs(full_obs, env_cfg)
-    env.env_cfg = env.state.env_cfg
-    env.env_cfg.verbose = 0
-    env.env_steps = env.state.env_steps
-    forward_obs = [full_obs]
-    for _ in range(n):
-        empty_actions = dict()
-        for agent in env.agents:
-            empty_actions[agent] = dict()
-        if len(env.agents) == 0:
-            # can't step any further
-            return [full_obs]
-        obs, _, _, _ = env.step(empty_actions)
-        forward_obs.append(obs[agent])
-    return forward_obs
\ No newline at end of file
+    env = _simulator.restore(_simulator._acquire(), _simulator.snapshot(full_obs, env_cfg))
+    try:
+        forward_obs = [full_obs]
+        for _ in range(n):
+            if len(env.agents) == 0:
+                # can't step any further
+                return [full_obs]
+            obs, _, _, _ = env.step(_simulator._format_actions({}))
+            forward_obs.append(obs["player_0"])
+        return forward_obs
+    finally:
+        _simulator._release(env)
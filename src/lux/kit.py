@@ -1,3 +1,4 @@
+import json
 from dataclasses import dataclass, field
 from typing import Dict
 import numpy as np
@@ -6,8 +7,35 @@ from lux.config import EnvConfig
 from lux.team import Team, FactionTypes
 from lux.unit import Unit
 from lux.factory import Factory
+from lux.lichen import LichenIndex
+try:
+    import orjson
+except ImportError:
+    orjson = None
 def process_action(action):
     return to_json(action)
+def _json_default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+def json_loads(data):
+    """
+    json.loads, using orjson when it is installed
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+def json_dumps(obj) -> str:
+    """
+    json.dumps which serializes numpy arrays and scalars as they are, so actions don't need to go through to_json first
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(obj, default=_json_default)
 def to_json(obj):
     if isinstance(obj, np.ndarray):
         return obj.tolist()
@@ -111,6 +139,148 @@ def obs_to_game_state(step, env_cfg: EnvConfig, obs):
 
     )
 
+class ObservationDecoder:
+    """
+    Stateful alternative to process_obs + obs_to_game_state.
+    Keeps the board arrays and unit objects between turns: board deltas are applied in bulk,
+    units and factories are updated in place by id.
+
+    After every decode, changed_cells holds positions changed on the board per item,
+    new_units/removed_units/moved_units hold the ids of units (and factories) which changed.
+    """
+
+    board_deltas = ["rubble", "lichen", "lichen_strains"]
+
+    def __init__(self, env_cfg: EnvConfig):
+        self.env_cfg = env_cfg
+        self.board = None
+        self.units = dict()
+        self.factories = dict()
+
+        self.changed_cells = dict()
+        self.lichen_index = LichenIndex(env_cfg)
+        self.new_units = set()
+        self.removed_units = set()
+        self.moved_units = set()
+
+    @staticmethod
+    def _parse_delta(delta):
+        positions = np.array(",".join(delta.keys()).split(","), dtype=int).reshape(-1, 2)
+        values = np.fromiter(delta.values(), dtype=int, count=len(delta))
+        return positions, values
+
+    def _decode_board(self, step, board_obs):
+        if self.board is None or step == 0:
+            self.board = Board(
+                rubble=np.array(board_obs["rubble"]),
+                ice=np.array(board_obs["ice"]),
+                ore=np.array(board_obs["ore"]),
+                lichen=np.array(board_obs["lichen"]),
+                lichen_strains=np.array(board_obs["lichen_strains"]),
+                factory_occupancy_map=np.ones((len(board_obs["rubble"]), len(board_obs["rubble"][0])), dtype=int) * -1,
+                factories_per_team=board_obs["factories_per_team"],
+                valid_spawns_mask=np.array(board_obs["valid_spawns_mask"]),
+            )
+            self.changed_cells = {item: np.argwhere(np.ones_like(self.board.rubble, dtype=bool)) for item in self.board_deltas}
+            return
+
+        if "valid_spawns_mask" in board_obs:
+            self.board.valid_spawns_mask = np.array(board_obs["valid_spawns_mask"])
+        for item in self.board_deltas:
+            delta = board_obs[item]
+            if not delta:
+                self.changed_cells[item] = np.empty((0, 2), dtype=int)
+                continue
+            positions, values = self._parse_delta(delta)
+            getattr(self.board, item)[positions[:, 0], positions[:, 1]] = values
+            self.changed_cells[item] = positions
+
+    def _decode_units(self, registry, units_obs, create, update):
+        """
+        Sync registry (agent -> unit_id -> object) with the observation
+
+        Returns:
+            bool: whether any unit was created or removed
+        """
+        changed = False
+        for agent, agent_units in units_obs.items():
+            known = registry.setdefault(agent, dict())
+            for unit_id in list(known):
+                if unit_id not in agent_units:
+                    del known[unit_id]
+                    self.removed_units.add(unit_id)
+                    changed = True
+            for unit_id, data in agent_units.items():
+                unit = known.get(unit_id)
+                if unit is None:
+                    known[unit_id] = create(data)
+                    self.new_units.add(unit_id)
+                    changed = True
+                else:
+                    update(unit, data)
+        return changed
+
+    def _create_unit(self, data):
+        unit = Unit(
+            **{**data, "pos": np.array(data["pos"]), "action_queue": np.array(data["action_queue"])},
+            unit_cfg=self.env_cfg.ROBOTS[data["unit_type"]],
+            env_cfg=self.env_cfg,
+        )
+        unit.cargo = UnitCargo(**data["cargo"])
+        return unit
+
+    def _update_unit(self, unit, data):
+        x, y = data["pos"]
+        if unit.pos[0] != x or unit.pos[1] != y:
+            unit.pos[0], unit.pos[1] = x, y
+            self.moved_units.add(unit.unit_id)
+        unit.power = data["power"]
+        unit.action_queue = np.array(data["action_queue"])
+        unit.cargo.__dict__.update(data["cargo"])
+
+    def _create_factory(self, data):
+        factory = Factory(**{**data, "pos": np.array(data["pos"])}, env_cfg=self.env_cfg)
+        factory.cargo = UnitCargo(**data["cargo"])
+        return factory
+
+    def _update_factory(self, factory, data):
+        factory.power = data["power"]
+        factory.cargo.__dict__.update(data["cargo"])
+
+    def decode(self, step, obs) -> "GameState":
+        """
+        Args:
+            step (int): env step
+            obs (dict): parsed json observation as it comes to the agent (full on step 0, delta after)
+        """
+        self.new_units = set()
+        self.removed_units = set()
+        self.moved_units = set()
+
+        self._decode_board(step, obs["board"])
+        self._decode_units(self.units, obs["units"], self._create_unit, self._update_unit)
+        factories_changed = self._decode_units(self.factories, obs["factories"], self._create_factory, self._update_factory)
+
+        if factories_changed:
+            self.board.factory_occupancy_map[:] = -1
+            for agent_factories in self.factories.values():
+                for factory in agent_factories.values():
+                    self.board.factory_occupancy_map[factory.pos_slice] = factory.strain_id
+        self.lichen_index.update(self.board, self.factories, np.vstack(list(self.changed_cells.values())), factories_changed)
+
+        teams = {agent: Team(**team_data, agent=agent) for agent, team_data in obs["teams"].items()}
+
+        return GameState(
+            env_cfg=self.env_cfg,
+            env_steps=step,
+            board=self.board,
+            units=self.units,
+            factories=self.factories,
+            teams=teams,
+            lichen_index=self.lichen_index,
+        )
+
+
 @dataclass
 class Board:
     rubble: np.ndarray
@@ -132,6 +302,15 @@ class GameState:
     units: Dict[str, Dict[str, Unit]] = field(default_factory=dict)
     factories: Dict[str, Dict[str, Factory]] = field(default_factory=dict)
     teams: Dict[str, Team] = field(default_factory=dict)
+    # kept up to date by ObservationDecoder, built on demand for states from obs_to_game_state
+    lichen_index: LichenIndex = None
+
+    def get_lichen_index(self):
+        if self.lichen_index is None:
+            self.lichen_index = LichenIndex(self.env_cfg)
+            self.lichen_index.update(self.board, self.factories)
+        return self.lichen_index
+
     @property
     def real_env_steps(self):
         """
@@ -0,0 +1,168 @@
+import numpy as np
+from scipy.ndimage import binary_dilation, label
+
+# 4-neighbours within a single factory layer of (F, W, H) stacks, layers never touch each other
+CROSS = np.zeros((3, 3, 3), dtype=bool)
+CROSS[1] = [[0, 1, 0], [1, 1, 1], [0, 1, 0]]
+NEIGHBOURS = CROSS.copy()
+NEIGHBOURS[1, 1, 1] = False
+
+# tiles around the factory where lichen starts to grow, as in luxai_s2 Factory.cache_water_info
+INIT_DELTAS = np.array([(0, -2), (-1, -2), (1, -2), (0, 2), (-1, 2), (1, 2), (2, 0), (2, -1), (2, 1), (-2, 0), (-2, -1), (-2, 1)])
+
+
+def forbidden_tiles(board):
+    """
+    Tiles lichen never grows on: rubble, resources and factories
+    """
+    return (board.rubble > 0) | (board.factory_occupancy_map != -1) | (board.ice > 0) | (board.ore > 0)
+
+
+def init_tiles(factories, shape):
+    """
+    Returns:
+        np.ndarray: (F, W, H) tiles around every factory where its lichen starts to grow
+    """
+    init = np.zeros((len(factories), *shape), dtype=bool)
+    for i, factory in enumerate(factories):
+        tiles = INIT_DELTAS + factory.pos
+        tiles = tiles[np.all((tiles >= 0) & (tiles < shape), axis=1)]
+        init[i, tiles[:, 0], tiles[:, 1]] = True
+    return init
+
+
+def grow_positions(lichen, lichen_strains, strains, init, forbidden, occupancy, min_lichen_to_spread):
+    """
+    Env watering rule for all the factories at once, over boolean (F, W, H) stacks
+
+    Args:
+        strains (np.ndarray): (F, 1, 1) strain of every factory
+        init (np.ndarray): (F, W, H) tiles around the factories, see init_tiles()
+        forbidden (np.ndarray): (W, H) tiles lichen never grows on, see forbidden_tiles()
+        occupancy (np.ndarray): (W, H) factory occupancy map of the board
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (F, W, H) masks of the tiles watering grows lichen on,
+        and of the lichen tiles connected to the factory
+    """
+    own = lichen_strains == strains
+    allowed_own = own & ~forbidden
+
+    # own lichen connected to the tiles around the factory
+    labels, _ = label(allowed_own, structure=CROSS)
+    connected_labels = np.unique(labels[init & allowed_own])
+    connected = np.isin(labels, connected_labels[connected_labels > 0])
+
+    # lichen spreads to the empty neighbours of the reached tiles with enough lichen
+    reached = (init | connected) & ~forbidden
+    spreading = reached & (lichen >= min_lichen_to_spread)
+    reached |= binary_dilation(spreading, structure=CROSS) & (lichen_strains == -1) & ~forbidden
+
+    # tiles next to other strains or factories are not grown
+    other = ((lichen_strains != -1) & ~own) | ((occupancy != -1) & (occupancy != strains))
+    blocked = binary_dilation(other, structure=NEIGHBOURS)
+    return reached & (~blocked | own), connected
+
+
+class LichenIndex:
+    """
+    Lichen tiles of every strain, connected to its factory or not, and the tiles watering would grow lichen on.
+    Follows the env watering rule, which grows connected lichen and its frontier.
+
+    Connectivity is recomputed only when board deltas change something it depends on:
+    strains, tiles having enough lichen to spread, rubble or factories. Queries are dict lookups.
+    """
+
+    def __init__(self, env_cfg):
+        self.env_cfg = env_cfg
+        self._strains = None
+        self._spreading = None
+        self._forbidden_rubble = None
+
+        self._tiles = {}
+        self._connected = {}
+        self._grow = {}
+        self._frontier = {}
+
+    def _is_outdated(self, board, cells):
+        if self._strains is None:
+            return True
+        if cells is None:
+            x, y = slice(None), slice(None)
+        else:
+            x, y = cells[:, 0], cells[:, 1]
+        spreading = board.lichen[x, y] >= self.env_cfg.MIN_LICHEN_TO_SPREAD
+        return (
+            np.any(board.lichen_strains[x, y] != self._strains[x, y])
+            or np.any(spreading != self._spreading[x, y])
+            or np.any((board.rubble[x, y] > 0) != self._forbidden_rubble[x, y])
+        )
+
+    def update(self, board, factories, changed_cells=None, factories_changed=True):
+        """
+        Args:
+            board: Board of the current turn
+            factories: agent -> unit_id -> Factory, all the factories on the board
+            changed_cells: Nx2 board cells changed since the previous update, None to compare the whole board
+            factories_changed: whether any factory has been built or destroyed
+        """
+        if not factories_changed and not self._is_outdated(board, changed_cells):
+            return
+
+        self._strains = board.lichen_strains.copy()
+        self._spreading = board.lichen >= self.env_cfg.MIN_LICHEN_TO_SPREAD
+        self._forbidden_rubble = board.rubble > 0
+        self._rebuild(board, [factory for agent_factories in factories.values() for factory in agent_factories.values()])
+
+    def _rebuild(self, board, factories):
+        strains, counts = np.unique(self._strains[self._strains != -1], return_counts=True)
+        self._tiles = dict(zip(strains.tolist(), counts.tolist()))
+        if not factories:
+            self._connected, self._grow, self._frontier = {}, {}, {}
+            return
+
+        factory_strains = np.array([factory.strain_id for factory in factories]).reshape(-1, 1, 1)
+        init = init_tiles(factories, self._strains.shape)
+        grow, connected = grow_positions(
+            board.lichen,
+            self._strains,
+            factory_strains,
+            init,
+            forbidden_tiles(board),
+            board.factory_occupancy_map,
+            self.env_cfg.MIN_LICHEN_TO_SPREAD,
+        )
+        own = self._strains == factory_strains
+
+        keys = factory_strains.ravel().tolist()
+        self._connected = dict(zip(keys, connected.sum(axis=(1, 2)).tolist()))
+        self._grow = dict(zip(keys, grow.sum(axis=(1, 2)).tolist()))
+        self._frontier = {key: np.argwhere(mask) for key, mask in zip(keys, grow & ~own)}
+
+    def tiles_count(self, strain_id):
+        """
+        All the lichen tiles of the strain, including the ones not connected to the factory anymore
+        """
+        return self._tiles.get(strain_id, 0)
+
+    def connected_count(self, strain_id):
+        """
+        Lichen tiles connected to the factory, they produce power
+        """
+        return self._connected.get(strain_id, 0)
+
+    def grow_count(self, strain_id):
+        """
+        Tiles watering grows lichen on: connected lichen and the frontier
+        """
+        return self._grow.get(strain_id, 0)
+
+    def frontier(self, strain_id):
+        """
+        Returns:
+            np.ndarray: Nx2 empty tiles lichen would spread to with the next watering
+        """
+        return self._frontier.get(strain_id, np.empty((0, 2), dtype=int))
+
+    def water_cost(self, strain_id):
+        return np.ceil(self.grow_count(strain_id) / self.env_cfg.LICHEN_WATERING_COST_FACTOR)
@@ -1,18 +1,24 @@
-import json
+import os
 from typing import Dict
 import sys
 from argparse import Namespace
 
 from bot import Agent
 from lux.config import EnvConfig
-from lux.kit import GameState, process_obs, to_json, from_json, process_action, obs_to_game_state
+from lux.kit import process_action, json_loads, json_dumps
 ### DO NOT REMOVE THE FOLLOWING CODE ###
 agent_dict = dict() # store potentially multiple dictionaries as kaggle imports code directly
-agent_prev_obs = dict()
 def agent_fn(observation, configurations):
     """
     agent definition for kaggle submission.
     """
+    return process_action(agent_act(observation, configurations))
+
+def agent_act(observation, configurations):
+    """
+    returns raw actions, which may contain numpy arrays.
+    observation.obs is either a json string (kaggle) or an already parsed dict (stdin loop below)
+    """
     global agent_dict
     step = observation.step
     
@@ -21,19 +27,23 @@ def agent_fn(observation, configurations):
     remainingOverageTime = observation.remainingOverageTime
     if step == 0:
         env_cfg = EnvConfig.from_dict(configurations["env_cfg"])
+        if player in agent_dict:
+            # the previous match may have ended before its last turn
+            agent_dict[player].close()
         agent_dict[player] = Agent(player, env_cfg)
-        agent_prev_obs[player] = dict()
         agent = agent_dict[player]
     agent = agent_dict[player]
-    obs = process_obs(player, agent_prev_obs[player], step, json.loads(observation.obs))
-    agent_prev_obs[player] = obs
+    # raw observation, agent keeps the decoded game state and applies deltas on its own
+    obs = observation.obs
+    if isinstance(obs, str):
+        obs = json_loads(obs)
     agent.step = step
     if obs["real_env_steps"] < 0:
         actions = agent.early_setup(step, obs, remainingOverageTime)
     else:
         actions = agent.act(step, obs, remainingOverageTime)
 
-    return process_action(actions)
+    return actions
 
 if __name__ == "__main__":
     
@@ -49,14 +59,22 @@ if __name__ == "__main__":
     player_id = 0
     configurations = None
     i = 0
+    # directory to save raw inputs into, used to replay matches in tools/benchmarks
+    record_dir = os.environ.get("RECORD_OBS")
     while True:
         inputs = read_input()
-        obs = json.loads(inputs)
+        obs = json_loads(inputs)
+        if record_dir:
+            with open(os.path.join(record_dir, f"{obs['player']}.jsonl"), "a") as f:
+                f.write(inputs + "\n")
         
-        observation = Namespace(**dict(step=obs["step"], obs=json.dumps(obs["obs"]), remainingOverageTime=obs["remainingOverageTime"], player=obs["player"], info=obs["info"]))
+        # obs is passed already parsed, agent_act doesn't need to load it again
+        observation = Namespace(
+            step=obs["step"], obs=obs["obs"], remainingOverageTime=obs["remainingOverageTime"], player=obs["player"], info=obs["info"]
+        )
         if i == 0:
             configurations = obs["info"]["env_cfg"]
         i += 1
-        actions = agent_fn(observation, dict(env_cfg=configurations))
-        # send actions to engine
-        print(json.dumps(actions))
\ No newline at end of file
+        actions = agent_act(observation, dict(env_cfg=configurations))
+        # send actions to engine, numpy arrays are serialized directly
+        print(json_dumps(actions))
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+In-process match engine: both agents are imported once and called directly, the environment is stepped without the runner.
+
+    python tools/ab/engine.py src bot_copies/v4_rubble_commuter --seed 101
+
+Agents which provide agent_act (src/) receive observations as python objects,
+older versions only accept json strings in agent_fn, so they still get the observation serialized.
+Agents share the process, so the global numpy random state is shared as well.
+"""
+import argparse
+import dataclasses
+import sys
+import time
+import traceback
+from argparse import Namespace
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "helpers"))
+
+from agent_loader import LoadedAgent  # noqa: E402
+
+_loaded_agents = {}
+
+
+def load_agent(path):
+    """
+    Agents are loaded once per process and reused by all the following matches
+    """
+    path = Path(path).resolve()
+    if path.name == "main.py":
+        path = path.parent
+    if path not in _loaded_agents:
+        _loaded_agents[path] = LoadedAgent(path)
+    return _loaded_agents[path]
+
+
+class Player:
+    # same time limits as in luxai_runner.bot.Bot
+    time_per_step = 3
+
+    def __init__(self, agent: LoadedAgent, player, verbose=False):
+        self.agent = agent
+        self.player = player
+        self.verbose = verbose
+        self.remainingOverageTime = 60
+        self.time = 0
+
+    def step(self, obs, step, env_cfg):
+        """
+        Returns:
+            dict | None: actions, None if the agent crashed or ran out of time
+        """
+        from luxai_runner.utils import to_json
+
+        observation = Namespace(
+            obs=to_json(obs),  # own copy, agents may update the observation in place
+            step=step,
+            remainingOverageTime=self.remainingOverageTime,
+            player=self.player,
+            reward=0.0,
+            info=dict(env_cfg=env_cfg) if step == 0 else dict(),
+        )
+        # EnvConfig.from_dict updates the dict in place
+        configurations = dict(env_cfg=to_json(env_cfg) if step == 0 else None)
+
+        start = time.perf_counter()
+        try:
+            with self.agent.activate():
+                if hasattr(self.agent.main, "agent_act"):
+                    actions = self.agent.main.agent_act(observation, configurations)
+                else:
+                    observation.obs = self.agent.main.json.dumps(observation.obs)
+                    actions = self.agent.main.agent_fn(observation, configurations)
+        except Exception:
+            if self.verbose:
+                traceback.print_exc()
+            actions = None
+        time_used = time.perf_counter() - start
+        self.time += time_used
+
+        self.remainingOverageTime -= max(time_used - self.time_per_step, 0)
+        if self.remainingOverageTime <= 0 or not isinstance(actions, dict):
+            return None
+        return {key: np.array(value) if isinstance(value, list) else value for key, value in actions.items()}
+
+
+def play_match(agent_0, agent_1, seed, max_steps=1000, verbose=False):
+    """
+    Args:
+        agent_0, agent_1: agent directories (or their main.py) playing as player_0 and player_1
+
+    Returns:
+        dict: final rewards, number of played turns and time spent by each agent
+    """
+    from luxai_s2 import LuxAI_S2
+
+    env = LuxAI_S2(verbose=int(verbose), validate_action_space=True, max_episode_length=max_steps)
+    env.reset(seed=seed)
+    env_cfg = dataclasses.asdict(env.state.env_cfg)
+    state_obs = env.state.get_compressed_obs()
+    obs = state_obs
+    players = {
+        "player_0": Player(load_agent(agent_0), "player_0", verbose),
+        "player_1": Player(load_agent(agent_1), "player_1", verbose),
+    }
+
+    done = False
+    while not done:
+        step = env.env_steps
+        actions = {player_id: player.step(obs, step, env_cfg) for player_id, player in players.items()}
+        new_state_obs, rewards, dones, infos = env.step(actions)
+        # agents get only the changes, same as with the luxai-s2 runner
+        obs = env.state.get_change_obs(state_obs)
+        state_obs = new_state_obs["player_0"]
+        done = sum(not dones[player_id] for player_id in dones) < 2
+
+    return dict(
+        rewards={player_id: int(reward) for player_id, reward in rewards.items()},
+        turns=env.state.real_env_steps,
+        time={player_id: round(player.time, 2) for player_id, player in players.items()},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("agents", nargs=2, help="agent directories or their main.py")
+    parser.add_argument("-s", "--seed", type=int, default=101)
+    parser.add_argument("-l", "--len", type=int, default=1000, help="max episode length")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print agent errors and invalid actions")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = play_match(*args.agents, args.seed, args.len, args.verbose)
+    print(f"{result} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
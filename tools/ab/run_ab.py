@@ -0,0 +1,215 @@
+"""
+A/B comparison of two agents: plays seeded matches in parallel and streams results into a file.
+
+    python tools/ab/run_ab.py --agent-a src --agent-b bot_copies/v4_rubble_commuter --games 500 --output result.csv
+
+Agents swap sides every game, game i is played with seed `--seed + i // 2`, so both agents play every map from both sides.
+Results are appended as soon as a match finishes; running the same command again resumes an interrupted run.
+Matches are played in-process by default (tools/ab/engine.py), --engine subprocess uses the luxai-s2 runner with agents talking over pipes.
+With --sprt the run stops as soon as the sequential test decides whether A is stronger than B.
+"""
+import argparse
+import asyncio
+import csv
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import engine
+from sprt import SPRT
+
+COLUMNS = ["game", "seed", "agent_a", "agent_b", "a_player", "a_reward", "b_reward", "a_win_flag", "turns", "duration", "error"]
+
+
+def agent_main(path):
+    path = Path(path)
+    return path if path.name == "main.py" else path / "main.py"
+
+
+def play_subprocess_match(players, seed, replay_path=None):
+    """
+    Plays a match through the luxai-s2 runner, every agent is a separate process talking over stdin/stdout
+    """
+    from luxai_runner.episode import Episode, EpisodeConfig, ReplayConfig
+    from luxai_s2 import LuxAI_S2
+
+    cfg = EpisodeConfig(
+        players=[str(agent_main(player)) for player in players],
+        env_cls=LuxAI_S2,
+        seed=seed,
+        env_cfg=dict(verbose=0, validate_action_space=True),
+        verbosity=0,
+        render=False,
+        save_replay_path=replay_path,
+        replay_options=ReplayConfig(save_format="json", compressed_obs=True),
+    )
+    episode = Episode(cfg)
+    rewards = asyncio.run(episode.run())
+    return dict(rewards=rewards, turns=episode.env.state.real_env_steps)
+
+
+def play_match(game, seed, agent_a, agent_b, engine_name="inprocess", replays_dir=None):
+    a_player = f"player_{game % 2}"
+    b_player = f"player_{1 - game % 2}"
+    players = [agent_a, agent_b] if a_player == "player_0" else [agent_b, agent_a]
+
+    start = time.perf_counter()
+    if engine_name == "subprocess":
+        replay_path = str(Path(replays_dir) / f"{game}_{seed}.json") if replays_dir else None
+        result = play_subprocess_match(players, seed, replay_path)
+    else:
+        result = engine.play_match(*players, seed)
+    rewards = result["rewards"]
+    return dict(
+        game=game,
+        seed=seed,
+        a_player=a_player,
+        a_reward=rewards[a_player],
+        b_reward=rewards[b_player],
+        turns=result["turns"],
+        duration=round(time.perf_counter() - start, 2),
+    )
+
+
+class CsvResults:
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def read(self):
+        if not self.path.exists():
+            return []
+        with open(self.path, newline="") as f:
+            return list(csv.DictReader(f))
+
+    def append(self, row):
+        is_new = not self.path.exists()
+        with open(self.path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            if is_new:
+                writer.writeheader()
+            writer.writerow(row)
+
+
+class ParquetResults:
+    """
+    Parquet files can't be appended, so the whole (small) table is rewritten after every match
+    """
+
+    def __init__(self, path):
+        import pandas as pd
+
+        self.pd = pd
+        self.path = Path(path)
+        self.rows = self.read()
+
+    def read(self):
+        if not self.path.exists():
+            return []
+        return self.pd.read_parquet(self.path).to_dict("records")
+
+    def append(self, row):
+        self.rows.append(row)
+        tmp_path = self.path.with_suffix(".tmp")
+        self.pd.DataFrame(self.rows, columns=COLUMNS).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+
+
+def open_results(path):
+    return ParquetResults(path) if Path(path).suffix == ".parquet" else CsvResults(path)
+
+
+def win_flag(a_reward, b_reward):
+    if a_reward == b_reward:
+        return 0.5
+    return float(a_reward > b_reward)
+
+
+def summary(rows):
+    games = [row for row in rows if not row["error"]]
+    if not games:
+        return "no finished games"
+    wins = [float(row["a_win_flag"]) for row in games]
+    errors = len(rows) - len(games)
+    return f"{len(games)} games, A win rate {sum(wins) / len(wins):.3f}" + (f", {errors} failed" if errors else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agent-a", required=True, help="agent directory or its main.py")
+    parser.add_argument("--agent-b", required=True, help="agent directory or its main.py")
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first map")
+    parser.add_argument("--workers", type=int, help="parallel matches, by default one per CPU for the inprocess engine")
+    parser.add_argument("--output", default="result.csv", help="csv or parquet file with per match results")
+    parser.add_argument("--engine", choices=["inprocess", "subprocess"], default="inprocess")
+    parser.add_argument("--replays", help="directory to save json replays into, subprocess engine only")
+    parser.add_argument("--sprt", action="store_true", help="stop early once the sequential probability ratio test is decided")
+    parser.add_argument("--elo0", type=float, default=0, help="SPRT null hypothesis: elo difference of A over B")
+    parser.add_argument("--elo1", type=float, default=50, help="SPRT alternative hypothesis: elo difference of A over B")
+    parser.add_argument("--alpha", type=float, default=0.05, help="SPRT false positive rate")
+    parser.add_argument("--beta", type=float, default=0.05, help="SPRT false negative rate")
+    args = parser.parse_args()
+    if args.replays and args.engine != "subprocess":
+        parser.error("--replays requires --engine subprocess")
+    if args.workers is None:
+        # an inprocess match runs in a single process, a subprocess match runs two agent processes at once
+        cpus = os.cpu_count() or 1
+        args.workers = cpus if args.engine == "inprocess" else max(1, cpus // 2)
+
+    agent_a, agent_b = str(Path(args.agent_a).resolve()), str(Path(args.agent_b).resolve())
+    results = open_results(args.output)
+    rows = results.read()
+    for row in rows:
+        if (row["agent_a"], row["agent_b"]) != (agent_a, agent_b):
+            raise ValueError(f"{args.output} contains results of other agents, remove it or choose another output")
+    done = {int(row["game"]) for row in rows}
+    todo = [game for game in range(args.games) if game not in done]
+    if done:
+        print(f"Resuming: {len(done)} games are already played")
+
+    sprt = SPRT(args.elo0, args.elo1, args.alpha, args.beta)
+    for row in rows:
+        if not row["error"]:
+            sprt.add(float(row["a_win_flag"]))
+    if args.sprt and sprt.status():
+        todo = []
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {}
+        for game in todo:
+            future = executor.submit(play_match, game, args.seed + game // 2, agent_a, agent_b, args.engine, args.replays)
+            futures[future] = game
+
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future.cancelled():
+                    continue
+                game = futures[future]
+                # numeric fields of failed matches stay empty (None), so the columns keep their types in parquet
+                row = dict(dict.fromkeys(COLUMNS), error="")
+                row.update(game=game, seed=args.seed + game // 2, agent_a=agent_a, agent_b=agent_b)
+                try:
+                    row.update(future.result())
+                    row["a_win_flag"] = win_flag(row["a_reward"], row["b_reward"])
+                    sprt.add(row["a_win_flag"])
+                except Exception as e:
+                    row["error"] = repr(e)
+                results.append(row)
+                rows.append(row)
+                outcome = row["error"] or f"{row['a_reward']} vs {row['b_reward']}"
+                print(f"game {game}: {outcome} | {summary(rows)}")
+
+            if args.sprt and sprt.status():
+                # matches in progress are still recorded, the rest are not started
+                for future in pending:
+                    future.cancel()
+
+    print(summary(rows))
+    print(sprt.report())
+
+
+if __name__ == "__main__":
+    main()
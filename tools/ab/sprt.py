@@ -0,0 +1,81 @@
+"""
+Sequential probability ratio test for match scores (1 win, 0.5 draw, 0 loss).
+Uses the normal approximation of the log-likelihood ratio, as done in chess engines testing (fishtest, cutechess).
+"""
+import math
+
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_to_elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+class SPRT:
+    """
+    H0: A is elo0 stronger than B, H1: A is elo1 stronger than B.
+    The test is stopped once the log-likelihood ratio leaves (lower, upper) bounds.
+    """
+
+    def __init__(self, elo0=0, elo1=50, alpha=0.05, beta=0.05):
+        self.score0 = elo_to_score(elo0)
+        self.score1 = elo_to_score(elo1)
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.scores = []
+
+    def add(self, score):
+        self.scores.append(score)
+
+    @property
+    def games(self):
+        return len(self.scores)
+
+    def _mean_var(self):
+        n = len(self.scores)
+        mean = sum(self.scores) / n
+        var = sum((x - mean) ** 2 for x in self.scores) / n
+        return mean, var
+
+    def llr(self):
+        if len(self.scores) < 2:
+            return 0.0
+        mean, var = self._mean_var()
+        if var == 0:
+            # all the games have the same outcome, shrink it a bit to keep the ratio finite
+            var = 1 / len(self.scores)
+        return (self.score1 - self.score0) * (2 * mean - self.score0 - self.score1) * len(self.scores) / (2 * var)
+
+    def status(self):
+        """
+        Returns:
+            str: "H1" if A is better, "H0" if it is not, None while undecided
+        """
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def confidence_interval(self, z=1.96):
+        """
+        Returns:
+            tuple[float, float, float]: mean score of A with the lower and upper bounds of its (95% by default) interval
+        """
+        if not self.scores:
+            return 0.5, 0.0, 1.0
+        mean, var = self._mean_var()
+        margin = z * math.sqrt(var / len(self.scores))
+        return mean, max(mean - margin, 0.0), min(mean + margin, 1.0)
+
+    def report(self):
+        mean, low, high = self.confidence_interval()
+        decision = {"H1": "A is better", "H0": "A is not better", None: "undecided"}[self.status()]
+        return (
+            f"SPRT: {decision} after {self.games} games, LLR {self.llr():.2f} ({self.lower:.2f}, {self.upper:.2f}), "
+            f"score {mean:.3f} [{low:.3f}, {high:.3f}], elo {score_to_elo(mean):+.0f} [{score_to_elo(low):+.0f}, {score_to_elo(high):+.0f}]"
+        )
@@ -0,0 +1,101 @@
+"""
+Wall time of planning all own robots moves for a turn: per-robot shortest paths with collision fallbacks
+(as UnitBehaviour.get_direction does) against the cooperative planner of MapManager (PATH_PLANNER=cooperative).
+
+Robots and their targets are placed randomly on the boards of recorded observations, recorded with RECORD_OBS=<dir>:
+    python tools/benchmarks/cooperative_planning.py <dir>/player_0.jsonl --robots 5 20 50
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SRC = Path(__file__).resolve().parents[2] / "src"
+sys.path.insert(0, str(SRC))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bot.map_manager import MapManager  # noqa: E402
+from bot.static_features import StaticFeatures  # noqa: E402
+from tiles_to_clean import iter_game_states  # noqa: E402
+
+
+def random_robots(map_state, n, rng):
+    """
+    Returns:
+        dict: unit_id -> (position, target), all on distinct cells robots can enter
+    """
+    free = np.argwhere(~map_state.static_features.enemy_factory_mask)
+    cells = free[rng.choice(len(free), size=2 * n, replace=False)]
+    return {f"unit_{i}": (cells[i], cells[n + i]) for i in range(n)}
+
+
+def reset(map_state, game_state, robots):
+    map_state.refresh(game_state)
+    map_state._distance_fields.clear()
+    map_state.botpos = {unit_id: tuple(pos) for unit_id, (pos, _) in robots.items()}
+    map_state.reservations.reset(map_state.botpos)
+
+
+def plan_per_robot(map_state, robots):
+    collisions = 0
+    for unit_id, (pos, target) in robots.items():
+        directions = map_state.shortest_path(pos, target)
+        if map_state.check_collision(pos, directions[0], unit_id=unit_id):
+            collisions += 1
+            for direction in range(4, -1, -1):
+                if not map_state.check_collision(pos, direction, unit_id=unit_id):
+                    directions = [direction]
+                    break
+        map_state.reserve_path(unit_id, pos, directions)
+    return collisions
+
+
+def plan_cooperative(map_state, robots):
+    for unit_id, (pos, target) in robots.items():
+        map_state.plan_path(unit_id, pos, target)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+", help="jsonl files with main.py inputs")
+    parser.add_argument("--robots", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--turns", type=int, default=50, help="turns sampled from every recording")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    planners = {"per-robot": plan_per_robot, "cooperative": plan_cooperative}
+    timings = {(name, n): [] for name in planners for n in args.robots}
+    collisions = {n: 0 for n in args.robots}
+
+    for path in args.recordings:
+        game_states = [(player, game_state) for player, game_state in iter_game_states(path) if game_state.factories[player]]
+        for i in np.linspace(0, len(game_states) - 1, min(args.turns, len(game_states))).astype(int):
+            player, game_state = game_states[i]
+            static_features = StaticFeatures(player)
+            static_features.refresh(game_state)
+            map_state = MapManager(player, static_features, cooperative=True)
+            map_state.refresh(game_state)
+
+            for n in args.robots:
+                robots = random_robots(map_state, n, rng)
+                for name, plan in planners.items():
+                    reset(map_state, game_state, robots)
+                    t = time.perf_counter()
+                    detected = plan(map_state, robots)
+                    timings[name, n].append(time.perf_counter() - t)
+                    if name == "per-robot":
+                        collisions[n] += detected
+
+    for (name, n), values in timings.items():
+        values = np.array(values) * 1000
+        print(f"{name:>12} {n:>3} robots: mean {values.mean():.2f} ms, p95 {np.percentile(values, 95):.2f} ms, max {values.max():.2f} ms")
+    for n, count in collisions.items():
+        print(f"{n:>3} robots: {count} per-robot first moves blocked over {len(timings['per-robot', n])} turns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Per-turn latency of agent versions on recorded observation streams.
+
+Record observations by running any match with RECORD_OBS=<dir> set for src/main.py, then:
+    python tools/benchmarks/latency.py <dir>/player_0.jsonl --agent src --agent bot_copies/v4_rubble_commuter -o latency.json
+
+Every (agent, recording) pair is replayed in a fresh process through agent_fn, exactly as kaggle calls it.
+Turn time is split into phases by wrapping the agent functions, phases missing in older versions are reported as 0.
+"""
+import argparse
+import json
+import resource
+import time
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# phase -> functions to time, as "module:attribute.path"; the first call of the phase on the stack is counted
+PHASES = {
+    "decode": [
+        "main:json_loads",
+        "main:json.loads",
+        "main:process_obs",
+        "agent:obs_to_game_state",
+        "bot.agent:obs_to_game_state",
+        "lux.kit:ObservationDecoder.decode",
+    ],
+    "refresh": [
+        "bot.state_manager:StateManager.refresh",
+        "bot.map_manager:MapManager.refresh",
+        "bot.static_features:StaticFeatures.refresh",
+    ],
+    "placement": ["bot.placement_behaviour:PlacementBehaviour.act"],
+    "factories": ["bot.agent:Agent._act_factories"],
+    "robots": ["bot.agent:Agent._act_robots"],
+    "encode": ["main:process_action"],
+}
+STATS = {
+    "p50": lambda values: np.percentile(values, 50),
+    "p95": lambda values: np.percentile(values, 95),
+    "max": np.max,
+    "mean": np.mean,
+}
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.turn = {}
+        self._active = set()
+
+    def wrap(self, phase, func):
+        def timed(*args, **kwargs):
+            if phase in self._active:
+                return func(*args, **kwargs)
+            self._active.add(phase)
+            t = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.turn[phase] = self.turn.get(phase, 0) + time.perf_counter() - t
+                self._active.discard(phase)
+
+        return timed
+
+    def instrument(self, agent):
+        """
+        Returns:
+            list[str]: functions found and wrapped in the agent
+        """
+        wrapped = []
+        for phase, targets in PHASES.items():
+            for target in targets:
+                module_name, path = target.split(":")
+                owner = agent.module(module_name)
+                *parents, name = path.split(".")
+                for parent in parents:
+                    owner = getattr(owner, parent, None)
+                if owner is None or not hasattr(owner, name):
+                    continue
+                setattr(owner, name, self.wrap(phase, getattr(owner, name)))
+                wrapped.append(target)
+        return wrapped
+
+
+def load_recording(path):
+    """
+    Inputs of main.py, converted into kaggle observations, so every agent version can consume them
+    """
+    turns = []
+    with open(path) as f:
+        for line in f:
+            data = json.loads(line)
+            observation = Namespace(
+                step=data["step"],
+                obs=json.dumps(data["obs"]),
+                remainingOverageTime=data["remainingOverageTime"],
+                player=data["player"],
+                info=data["info"],
+            )
+            turns.append(observation)
+    return turns
+
+
+def summarize(values):
+    values = np.asarray(values) * 1000
+    return {name: round(float(stat(values)), 3) for name, stat in STATS.items()}
+
+
+def replay(agent_dir, recording):
+    # imported here, so only the child process is polluted with the agent modules
+    import sys
+
+    sys.path.insert(0, str(ROOT / "tools" / "helpers"))
+    from agent_loader import LoadedAgent
+
+    turns = load_recording(recording)
+    agent = LoadedAgent(agent_dir)
+    timer = PhaseTimer()
+    wrapped = timer.instrument(agent)
+    configurations = dict(env_cfg=turns[0].info["env_cfg"])
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    per_turn = {phase: [] for phase in ["total", *PHASES, "other"]}
+    with agent.activate():
+        for observation in turns:
+            timer.turn = {}
+            t = time.perf_counter()
+            agent.main.agent_fn(observation, configurations)
+            total = time.perf_counter() - t
+
+            per_turn["total"].append(total)
+            for phase in PHASES:
+                per_turn[phase].append(timer.turn.get(phase, 0))
+            per_turn["other"].append(total - sum(timer.turn.values()))
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "agent": str(agent_dir),
+        "recording": str(recording),
+        "turns": len(turns),
+        "wrapped": wrapped,
+        # ru_maxrss is in kilobytes on linux
+        "peak_rss_mb": round(rss_after / 1024, 1),
+        "replay_rss_mb": round((rss_after - rss_before) / 1024, 1),
+        "phases": {phase: summarize(values) for phase, values in per_turn.items()},
+        "per_turn_ms": {phase: np.round(np.asarray(values) * 1000, 3).tolist() for phase, values in per_turn.items()},
+    }
+
+
+def print_result(result):
+    print(f"{result['agent']} on {result['recording']}: {result['turns']} turns, peak rss {result['peak_rss_mb']} MB")
+    print(f"{'phase':>10} " + " ".join(f"{name:>9}" for name in STATS))
+    for phase, stats in result["phases"].items():
+        print(f"{phase:>10} " + " ".join(f"{value:>9.3f}" for value in stats.values()))
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+", help="jsonl files with main.py inputs")
+    parser.add_argument("--agent", action="append", help="agent directory with main.py, can be repeated (default: src)")
+    parser.add_argument("-o", "--output", help="json file to save the results with per turn timings")
+    args = parser.parse_args()
+
+    results = []
+    for agent_dir in args.agent or ["src"]:
+        for recording in args.recordings:
+            # a fresh process per replay, so agents don't share modules and peak memory is not accumulated
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                result = executor.submit(replay, Path(agent_dir).resolve(), Path(recording).resolve()).result()
+            print_result(result)
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f)
+
+
+if __name__ == "__main__":
+    main()
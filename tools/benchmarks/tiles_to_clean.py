@@ -0,0 +1,98 @@
+"""
+Compare MapManager.get_tiles_to_clean with the original pairwise implementation on recorded observations.
+
+Record observations by running any match with RECORD_OBS=<dir> set for src/main.py, then:
+    python tools/benchmarks/tiles_to_clean.py <dir>/player_0.jsonl
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+SRC = Path(__file__).resolve().parents[2] / "src"
+sys.path.insert(0, str(SRC))
+
+from bot.map_manager import MapManager  # noqa: E402
+from bot.static_features import StaticFeatures  # noqa: E402
+from lux.config import EnvConfig  # noqa: E402
+from lux.kit import obs_to_game_state, process_obs  # noqa: E402
+
+
+def reference_tiles_to_clean(map_state):
+    """
+    Original implementation with pairwise comparisons of tile sets
+    """
+    lichen_borders = map_state.get_lichen_borders(map_state.player)
+
+    rubble_locations = map_state.rubble_locations.reshape(-1, 2)
+    mask = cdist(map_state.factory_tiles, rubble_locations, "cityblock").min(axis=0) < 9
+    mask_border = (rubble_locations[:, None] == lichen_borders).all(axis=2).any(axis=1)
+
+    rubble_locations = map_state.rubble_locations.reshape(-1, 2)[mask | mask_border]
+
+    rubble = np.vstack([rubble_locations, map_state.opponent_lichen_locations.reshape(-1, 2)])
+
+    enemy_borders = map_state.get_lichen_borders(map_state.opp_player)
+
+    resources = np.vstack([map_state.ice_locations, map_state.ore_locations, enemy_borders])
+    mask = ~(rubble[:, None] == resources).all(axis=2).any(axis=1)
+    return rubble[mask]
+
+
+def iter_game_states(path):
+    env_cfg = None
+    obs = dict()
+    with open(path) as f:
+        for line in f:
+            data = json.loads(line)
+            if env_cfg is None:
+                env_cfg = EnvConfig.from_dict(data["info"]["env_cfg"])
+                player = data["player"]
+            obs = process_obs(player, obs, data["step"], data["obs"])
+            if obs["real_env_steps"] < 0:
+                continue
+            yield player, obs_to_game_state(data["step"], env_cfg, obs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+", help="jsonl files with main.py inputs")
+    args = parser.parse_args()
+
+    timings = {"reference": [], "current": []}
+    turns = 0
+    for path in args.recordings:
+        map_state = None
+        for player, game_state in iter_game_states(path):
+            if not game_state.factories[player]:
+                continue
+            if map_state is None:
+                static_features = StaticFeatures(player)
+                map_state = MapManager(player, static_features)
+            static_features.refresh(game_state)
+            map_state.refresh(game_state)
+
+            t = time.perf_counter()
+            expected = reference_tiles_to_clean(map_state)
+            timings["reference"].append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            actual = map_state.get_tiles_to_clean()
+            timings["current"].append(time.perf_counter() - t)
+
+            if not np.array_equal(expected, actual):
+                raise AssertionError(f"{path}: mismatch on turn {game_state.real_env_steps}")
+            turns += 1
+
+    print(f"{turns} turns, outputs are identical")
+    for name, values in timings.items():
+        values = np.array(values) * 1000
+        print(f"{name:>10}: mean {values.mean():.3f} ms, p95 {np.percentile(values, 95):.3f} ms, max {values.max():.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
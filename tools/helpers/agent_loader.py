@@ -0,0 +1,62 @@
+"""
+Load agents from different directories into one python process.
+
+Every agent (src/ and all the bot_copies/) ships its own `main`, `bot` and `lux` modules,
+so each agent gets its own set of module objects, which are swapped into sys.modules only while it is active.
+"""
+import contextlib
+import importlib.util
+import sys
+from pathlib import Path
+
+
+class LoadedAgent:
+    def __init__(self, path):
+        path = Path(path).resolve()
+        self.path = path.parent if path.is_file() else path
+        self.name = self.path.name
+        self.modules = {}
+        self.main = self._load()
+
+    def _is_own_module(self, module):
+        file = getattr(module, "__file__", None)
+        return file is not None and Path(file).resolve().is_relative_to(self.path)
+
+    def _load(self):
+        before = set(sys.modules)
+        sys.path.insert(0, str(self.path))
+        try:
+            spec = importlib.util.spec_from_file_location("main", self.path / "main.py")
+            main = importlib.util.module_from_spec(spec)
+            sys.modules["main"] = main
+            spec.loader.exec_module(main)
+        finally:
+            sys.path.remove(str(self.path))
+            # keep the agent modules aside, so the next agent imports its own copies
+            for name in set(sys.modules) - before:
+                if name == "main" or self._is_own_module(sys.modules[name]):
+                    self.modules[name] = sys.modules.pop(name)
+        return main
+
+    @contextlib.contextmanager
+    def activate(self):
+        """
+        Make agent modules importable by their usual names, for the imports done at runtime
+        """
+        saved = {name: sys.modules.get(name) for name in self.modules}
+        sys.modules.update(self.modules)
+        try:
+            yield self
+        finally:
+            for name, module in saved.items():
+                if module is None:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = module
+
+    def module(self, name):
+        return self.modules.get(name)
+
+    def agent_fn(self, observation, configurations):
+        with self.activate():
+            return self.main.agent_fn(observation, configurations)
@@ -1,86 +1,103 @@
-# Define helper functions
-from itertools import chain
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
 import numpy as np
 
+SRC = Path(__file__).resolve().parents[2] / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
 
-def adjacent_indices(game_map, center_indices):
-    # print(center_indices)
-    rows, cols = center_indices
-    indices = np.array([(rows - 1, cols), (rows + 1, cols), (rows, cols - 1), (rows, cols + 1)])
-    mask = np.logical_and.reduce((np.all(indices >= 0, axis=1), indices[:, 0] < game_map.shape[0], indices[:, 1] < game_map.shape[1]))
-    return indices[mask]
+from lux.lichen import forbidden_tiles, grow_positions, init_tiles  # noqa: E402
 
 
-def simulate_factory_lichen_growth(factory_indices, lichen_map, game_map, n=1):
-    """
+class LichenProjection(NamedTuple):
+    lichen: np.ndarray  # (k, W, H) lichen after every simulated step
+    lichen_strains: np.ndarray  # (k, W, H) strains after every simulated step
+    water_cost: np.ndarray  # (k, F) water spent by every factory on every step
+    tiles: np.ndarray  # (k, F) lichen tiles of every factory after every step
 
-    Args:
-        factory_indices (np.ndarray): target factory tiles
-        lichen_map (np.ndarray): lichen values (of specific strain)
-        game_map (np.ndarray): 0 for free position, 1 - resources, rubble, factories
-        n (int): steps to simulate
 
-    Returns:
-        np.ndarray: expected lichen map for the next turn
+class LichenSimulator:
+    """
+    Lichen growth of all the factories at once, over boolean (F, W, H) stacks.
+    Follows the env rules: a factory grows lichen on the tiles connected to it,
+    tiles next to other strains and factories are not grown.
+    Rubble, resources and factories are supposed to stay as they are during the simulation.
     """
-    # factory_indices = game_map == 2
-    for i in range(n):
-        spread_indices = np.logical_and(lichen_map >= 20, game_map == 0)
-        spread_indices = np.argwhere(spread_indices)
-
-        current_mask = np.logical_and(lichen_map > 0, lichen_map < 100)
-
-        empty_indices_lst = []
-        for spread_idx in chain(spread_indices, factory_indices):
-            # Seed lichen in adjacent empty cells
-            adjacent_indices_list = adjacent_indices(game_map, spread_idx)
-            empty_indices_mask = np.logical_and.reduce(
-                (
-                    adjacent_indices_list[:, 0] >= 0,
-                    adjacent_indices_list[:, 0] < game_map.shape[0],
-                    adjacent_indices_list[:, 1] >= 0,
-                    adjacent_indices_list[:, 1] < game_map.shape[1],
-                    game_map[tuple(adjacent_indices_list.T)] == 0,
-                    lichen_map[tuple(adjacent_indices_list.T)] == 0,
-                )
-            )
-            empty_indices = adjacent_indices_list[empty_indices_mask]
-
-            empty_indices_lst.append(empty_indices)
-        empty_indices = np.vstack(empty_indices_lst)
-
-        lichen_map[tuple(empty_indices.T)] = 1
-        lichen_map[current_mask] += 1
-
-    return lichen_map
 
+    def __init__(self, board, factories, env_cfg):
+        """
+        Args:
+            board: lux Board of the current turn
+            factories: list of Factory, in the order the env processes them (player_0 first)
+            env_cfg: EnvConfig
+        """
+        self.env_cfg = env_cfg
+        self.lichen = np.asarray(board.lichen)
+        self.lichen_strains = np.asarray(board.lichen_strains)
+        self.strains = np.array([factory.strain_id for factory in factories]).reshape(-1, 1, 1)
+
+        self.occupancy = np.asarray(board.factory_occupancy_map)
+        self.forbidden = forbidden_tiles(board)
+        self.init = init_tiles(factories, self.lichen.shape)
+
+    def grow_positions(self, lichen, lichen_strains):
+        """
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (F, W, H) masks of the tiles watering grows lichen on,
+            and of the lichen tiles connected to the factory
+        """
+        return grow_positions(
+            lichen, lichen_strains, self.strains, self.init, self.forbidden, self.occupancy, self.env_cfg.MIN_LICHEN_TO_SPREAD
+        )
+
+    def step(self, lichen, lichen_strains, watering):
+        """
+        Args:
+            watering (np.ndarray): (F,) bool, factories which water lichen on this step
+
+        Returns:
+            tuple: lichen and strains after the step, (F,) water cost of every factory
+        """
+        grow, _ = self.grow_positions(lichen, lichen_strains)
+        water_cost = np.ceil(grow.sum(axis=(1, 2)) / self.env_cfg.LICHEN_WATERING_COST_FACTOR) * watering
+        grow &= np.reshape(watering, (-1, 1, 1))
+
+        lichen = lichen + grow.sum(axis=0) * (self.env_cfg.LICHEN_GAINED_WITH_WATER + self.env_cfg.LICHEN_LOST_WITHOUT_WATER)
+        # contested tiles go to the last watering factory, as the env processes them in order
+        grown = grow.any(axis=0)
+        last = len(grow) - 1 - np.argmax(grow[::-1], axis=0)
+        lichen_strains = np.where(grown, self.strains.ravel()[last] if len(grow) else -1, lichen_strains)
+
+        lichen = np.clip(lichen - self.env_cfg.LICHEN_LOST_WITHOUT_WATER, 0, self.env_cfg.MAX_LICHEN_PER_TILE)
+        lichen_strains = np.where(lichen == 0, -1, lichen_strains)
+        return lichen, lichen_strains, water_cost
+
+    def simulate(self, k, watering=True):
+        """
+        Args:
+            k (int): steps to simulate
+            watering: whether factories water lichen: bool for all, (F,) per factory or (k, F) per step and factory
+
+        Returns:
+            LichenProjection
+        """
+        watering = np.broadcast_to(watering, (k, len(self.strains)))
+        lichen, lichen_strains = self.lichen, self.lichen_strains
+        projection = []
+        for step_watering in watering:
+            lichen, lichen_strains, water_cost = self.step(lichen, lichen_strains, step_watering)
+            tiles = (lichen_strains == self.strains).sum(axis=(1, 2))
+            projection.append((lichen, lichen_strains, water_cost, tiles))
+        return LichenProjection(*(np.array(values) for values in zip(*projection)))
 
-def simulate_lichen_growth(factories, game_state, n):
 
-    estimate = {}
-
-    for factory_id, factory in factories.items():
-        estimate[factory_id] = np.where(game_state.board.lichen_strains == factory.strain_id, game_state.board.lichen_strains, 0)
-
-    for _ in range(n):
-        for factory_id, factory in factories.items():
-            factory_indices = np.argwhere(game_state.board.factory_occupancy_map == factory.strain_id)
-            game_map = np.add.reduce(
-                [
-                    game_state.board.rubble,
-                    game_state.board.ice,
-                    game_state.board.ore,
-                    (game_state.board.factory_occupancy_map > -1).astype(int),
-                    *estimate.values()
-                ]
-            )
-            lichen_map = estimate[factory_id]
-
-            estimate[factory_id] = simulate_factory_lichen_growth(factory_indices, game_map, lichen_map, n=1)
-
-        # erase cell, which are going to be populated by two different strains
-        lichen_occupation = np.add.reduce(list(map(lambda x: np.clip(x, 0, 1), estimate.values())))
-        invalid_mask = lichen_occupation > 1
-        for x in estimate.values():
-            x[invalid_mask] = 0
-        yield estimate
+def simulate_lichen_growth(factories, game_state, n):
+    """
+    Yields estimated lichen map of every factory strain for the next `n` steps, all the factories watering each step
+    """
+    simulator = LichenSimulator(game_state.board, list(factories.values()), game_state.env_cfg)
+    projection = simulator.simulate(n)
+    for lichen, lichen_strains in zip(projection.lichen, projection.lichen_strains):
+        yield {factory_id: np.where(lichen_strains == factory.strain_id, lichen, 0) for factory_id, factory in factories.items()}